@@ -2,92 +2,311 @@
 Stores game state, valid moves, and move log.
 """
 
-import numpy as np
-import string
+import random
+
+from .evaluation import MG_TABLE, EG_TABLE, PHASE_TABLE
+from .tables import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, ROOK_REACH, BISHOP_REACH, BETWEEN, rook_attacks, \
+    bishop_attacks, queen_attacks
+
+
+# bitboards use one bit per square, square index = row * 8 + col (a8 is bit 0, h1 is bit 63)
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+NOT_A = FULL ^ FILE_A
+NOT_H = FULL ^ FILE_H
+ROW_2 = 0xFF << 16  # squares a black pawn reaches with a single push from its start row
+ROW_5 = 0xFF << 40  # squares a white pawn reaches with a single push from its start row
+PROMOTION_ROWS = 0xFF | 0xFF << 56
+LIGHT_SQUARES = sum(1 << sq for sq in range(64) if (sq >> 3) + (sq & 7) & 1 == 0)
+
+# square names by index, e.g. SQUARE_NAMES[0] == "a8"
+FILES = "abcdefgh"
+SQUARE_NAMES = [FILES[sq & 7] + str(8 - (sq >> 3)) for sq in range(64)]
+
+PIECES = ["wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK"]
+PROMOTION_PIECES = ["Q", "R", "B", "N"]
+
+# Move.flags bits
+ENPASSANT, CASTLE = 1, 2
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# castling rights bits, in FEN order
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+CASTLING_FEN = {"K": WHITE_KINGSIDE, "Q": WHITE_QUEENSIDE, "k": BLACK_KINGSIDE, "q": BLACK_QUEENSIDE}
+# rights kept when a piece moves from or to each square, so moving a king or rook (or capturing a rook) drops them
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[60] ^= WHITE_KINGSIDE | WHITE_QUEENSIDE
+CASTLING_MASK[63] ^= WHITE_KINGSIDE
+CASTLING_MASK[56] ^= WHITE_QUEENSIDE
+CASTLING_MASK[4] ^= BLACK_KINGSIDE | BLACK_QUEENSIDE
+CASTLING_MASK[7] ^= BLACK_KINGSIDE
+CASTLING_MASK[0] ^= BLACK_QUEENSIDE
+# zobrist keys, a position's key is the XOR of the keys for its pieces, side to move, castling rights and enpassant file
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES = {piece: [_zobrist_random.getrandbits(64) for _ in range(64)] for piece in PIECES}
+ZOBRIST_BLACK_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_ENPASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]
+# right: (king start, king end, squares that have to be empty, squares the king passes that can't be attacked)
+CASTLES = {
+    WHITE_KINGSIDE: (60, 62, 1 << 61 | 1 << 62, 1 << 60 | 1 << 61 | 1 << 62),
+    WHITE_QUEENSIDE: (60, 58, 1 << 57 | 1 << 58 | 1 << 59, 1 << 60 | 1 << 59 | 1 << 58),
+    BLACK_KINGSIDE: (4, 6, 1 << 5 | 1 << 6, 1 << 4 | 1 << 5 | 1 << 6),
+    BLACK_QUEENSIDE: (4, 2, 1 << 1 | 1 << 2 | 1 << 3, 1 << 4 | 1 << 3 | 1 << 2)}
+
+# (shift, wrap mask) for each ray direction, a negative shift moves towards row 0. batch uses them to slide whole sets
+# of pieces at once, GameState looks attacks up in the tables module instead
+ORTHOGONAL = [(-8, FULL), (8, FULL), (1, NOT_A), (-1, NOT_H)]
+DIAGONAL = [(-7, NOT_A), (-9, NOT_H), (9, NOT_A), (7, NOT_H)]
 
 
 class GameState:
-    def __init__(self):
-        # board is 8x8 array with piece names and empty squares represented by --
-        self.board = np.array([
-            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-            ["bP" for _ in range(8)],
-            ["--" for _ in range(8)],
-            ["--" for _ in range(8)],
-            ["--" for _ in range(8)],
-            ["--" for _ in range(8)],
-            ["wP" for _ in range(8)],
-            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]])
-
-        self.white_move = True  # white's turn to move at first
-        self.move_log = []
-
+    def __init__(self, fen=START_FEN):
         self.move_functions = {"P": self.get_pawn_moves, "R": self.get_rook_moves, "N": self.get_knight_moves,
                                "B": self.get_bishop_moves, "Q": self.get_queen_moves, "K": self.get_king_moves}
-
-        self.white_king_loc = (7, 4)
-        self.black_king_loc = (0, 4)
+        self.target_functions = {"P": self.pawn_targets, "R": self.rook_targets, "N": self.knight_targets,
+                                 "B": self.bishop_targets, "Q": self.queen_targets, "K": self.king_targets}
+
+        self.move_cache = None  # optional cache of legal move lists by zobrist key, see transposition.MoveCache
+        self.load_fen(fen)
+
+    def load_fen(self, fen):
+        """ sets up the position from a FEN string, the move log starts empty """
+        fields = fen.split()
+        # one bitboard per piece, plus occupancy masks for each color and for the whole board
+        self.bitboards = {piece: 0 for piece in PIECES}
+        self.occupancy = {"w": 0, "b": 0}
+        self.occupied = 0
+        # mailbox copy of the bitboards so the piece on a square is a single list lookup, empty squares are --
+        self.squares = ["--"] * 64
+        self.zobrist_key = 0  # kept up to date by put_piece, remove_piece and make_move
+        # running evaluation totals kept up to date by put_piece and remove_piece, see evaluation.evaluate
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+        for r, row in enumerate(fields[0].split("/")):
+            c = 0
+            for char in row:
+                if char.isdigit():
+                    c += int(char)
+                else:
+                    self.put_piece(r * 8 + c, ("w" if char.isupper() else "b") + char.upper())
+                    c += 1
+
+        self.white_move = fields[1] == "w"
+        self.castling_rights = 0
+        for char in fields[2]:
+            self.castling_rights |= CASTLING_FEN.get(char, 0)
+        self.enpassant_sq = None  # square a pawn can capture onto en passant, if any
+        if fields[3] != "-":
+            self.enpassant_sq = (8 - int(fields[3][1])) * 8 + "abcdefgh".index(fields[3][0])
+        # moves since the last capture or pawn move, for the fifty move rule, and the move number
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        self.move_log = []
+        # enpassant square, castling rights, zobrist key and halfmove clock before each move, restored by undo
+        self.state_log = []
+        if not self.white_move:
+            self.zobrist_key ^= ZOBRIST_BLACK_MOVE
+        self.zobrist_key ^= ZOBRIST_CASTLING[self.castling_rights]
+        if self.enpassant_sq is not None:
+            self.zobrist_key ^= ZOBRIST_ENPASSANT[self.enpassant_sq & 7]
+
+        white_king = self.bitboards["wK"].bit_length() - 1
+        black_king = self.bitboards["bK"].bit_length() - 1
+        self.white_king_loc = (white_king >> 3, white_king & 7)
+        self.black_king_loc = (black_king >> 3, black_king & 7)
 
         self.checkmate = False
         self.stalemate = False
 
-    def make_move(self, move, print_move=True):
-        if self.board[move.start_row][move.start_col] != "--":  # checks if start_sq is empty
-            if move.promotion():
-                if self.board[move.start_row][move.start_col][0] == "w":
-                    self.board[move.end_row][move.end_col] = "wQ"
-                else:
-                    self.board[move.end_row][move.end_col] = "bQ"
-
-            elif move.enpassant():  # pawn moves onto empty square diagonally,
-                self.board[move.start_row][move.end_col] = "--"  # enpassant logic
-                self.board[move.end_row][move.end_col] = move.piece_moved
-
+    def get_fen(self):
+        """ the position as a FEN string """
+        rows = []
+        for r in range(8):
+            row = ""
+            empty = 0
+            for piece in self.squares[r * 8:r * 8 + 8]:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += piece[1] if piece[0] == "w" else piece[1].lower()
+            if empty:
+                row += str(empty)
+            rows.append(row)
+        castling = "".join(char for char, right in CASTLING_FEN.items() if self.castling_rights & right) or "-"
+        enpassant = "-"
+        if self.enpassant_sq is not None:
+            enpassant = SQUARE_NAMES[self.enpassant_sq]
+        return " ".join(["/".join(rows), "w" if self.white_move else "b", castling, enpassant,
+                         str(self.halfmove_clock), str(self.fullmove_number)])
+
+    @property
+    def board(self):
+        """ 8x8 view of the position with piece names and empty squares represented by -- """
+        return [self.squares[r * 8:r * 8 + 8] for r in range(8)]
+
+    def put_piece(self, sq, piece):
+        bit = 1 << sq
+        self.bitboards[piece] |= bit
+        self.occupancy[piece[0]] |= bit
+        self.occupied |= bit
+        self.squares[sq] = piece
+        self.zobrist_key ^= ZOBRIST_PIECES[piece][sq]
+        self.mg_score += MG_TABLE[piece][sq]
+        self.eg_score += EG_TABLE[piece][sq]
+        self.phase += PHASE_TABLE[piece]
+
+    def remove_piece(self, sq):
+        piece = self.squares[sq]
+        bit = 1 << sq
+        self.bitboards[piece] ^= bit
+        self.occupancy[piece[0]] ^= bit
+        self.occupied ^= bit
+        self.squares[sq] = "--"
+        self.zobrist_key ^= ZOBRIST_PIECES[piece][sq]
+        self.mg_score -= MG_TABLE[piece][sq]
+        self.eg_score -= EG_TABLE[piece][sq]
+        self.phase -= PHASE_TABLE[piece]
+        return piece
+
+    def compute_zobrist_key(self):
+        """ zobrist key of the position computed from scratch, zobrist_key is the same value kept incrementally """
+        key = 0
+        for sq, piece in enumerate(self.squares):
+            if piece != "--":
+                key ^= ZOBRIST_PIECES[piece][sq]
+        if not self.white_move:
+            key ^= ZOBRIST_BLACK_MOVE
+        key ^= ZOBRIST_CASTLING[self.castling_rights]
+        if self.enpassant_sq is not None:
+            key ^= ZOBRIST_ENPASSANT[self.enpassant_sq & 7]
+        return key
+
+    def repetition_count(self):
+        """ number of earlier times the current position occurred with the same side to move """
+        key = self.zobrist_key
+        # a capture or pawn move can't be undone, so nothing before the last one can repeat
+        earlier = self.state_log[max(0, len(self.state_log) - self.halfmove_clock):] if self.halfmove_clock else []
+        return sum(1 for state in earlier[-2::-2] if state[2] == key)
+
+    def insufficient_material(self):
+        """ True when neither side can possibly mate: bare kings, a single minor piece, or only same colored bishops """
+        bitboards = self.bitboards
+        if (bitboards["wP"] | bitboards["bP"] | bitboards["wR"] | bitboards["bR"] | bitboards["wQ"] |
+                bitboards["bQ"]):
+            return False
+        knights = bitboards["wN"] | bitboards["bN"]
+        bishops = bitboards["wB"] | bitboards["bB"]
+        if not knights:
+            return not bishops & LIGHT_SQUARES or not bishops & ~LIGHT_SQUARES
+        return not bishops and not knights & (knights - 1)
+
+    def make_move(self, move, print_move=False):
+        start = move.start
+        end = move.end
+        if self.squares[start] != "--":  # checks if start_sq is empty
+            key = self.zobrist_key
+            self.remove_piece(start)
+            if move.flags & ENPASSANT:
+                self.remove_piece((start & 56) | (end & 7))  # enpassant logic, captured pawn is beside the start square
+            elif move.piece_captured != "--":
+                self.remove_piece(end)
+
+            if move.promotion_choice:
+                self.put_piece(end, move.piece_moved[0] + move.promotion_choice)
             else:
-                self.board[move.end_row][move.end_col] = move.piece_moved
-
-            self.board[move.start_row][move.start_col] = "--"
+                self.put_piece(end, move.piece_moved)
+            if move.flags & CASTLE:  # rook jumps over the king
+                if end & 7 == 6:
+                    self.put_piece(end - 1, self.remove_piece(end + 1))
+                else:
+                    self.put_piece(end + 1, self.remove_piece(end - 2))
 
             self.move_log.append(move)
+            self.state_log.append((self.enpassant_sq, self.castling_rights, key, self.halfmove_clock))
+            if move.piece_moved[1] == "P" or move.piece_captured != "--":
+                self.halfmove_clock = 0
+            else:
+                self.halfmove_clock += 1
+            if not self.white_move:
+                self.fullmove_number += 1
+            if self.enpassant_sq is not None:
+                self.zobrist_key ^= ZOBRIST_ENPASSANT[self.enpassant_sq & 7]
+            if move.piece_moved[1] == "P" and abs(start - end) == 16:
+                self.enpassant_sq = (start + end) // 2
+                self.zobrist_key ^= ZOBRIST_ENPASSANT[end & 7]
+            else:
+                self.enpassant_sq = None
+            rights = self.castling_rights & CASTLING_MASK[start] & CASTLING_MASK[end]
+            self.zobrist_key ^= ZOBRIST_CASTLING[self.castling_rights] ^ ZOBRIST_CASTLING[rights] ^ ZOBRIST_BLACK_MOVE
+            self.castling_rights = rights
 
             self.white_move = not self.white_move  # turn changes
 
             if print_move:
-                print(move.get_notation())
+                print(move.get_notation(self))
 
             # updating king location
             if move.piece_moved == "wK":
-                self.white_king_loc = (move.end_row, move.end_col)
+                self.white_king_loc = (end >> 3, end & 7)
             elif move.piece_moved == "bK":
-                self.black_king_loc = (move.end_row, move.end_col)
+                self.black_king_loc = (end >> 3, end & 7)
 
     def undo_move(self):
         if len(self.move_log) != 0:
             move = self.move_log.pop()
-            self.board[move.start_row][move.start_col] = move.piece_moved
+            self.enpassant_sq, self.castling_rights, key, self.halfmove_clock = self.state_log.pop()
+            if self.white_move:
+                self.fullmove_number -= 1
+            start = move.start
+            end = move.end
+            self.remove_piece(end)
+            self.put_piece(start, move.piece_moved)
+            if move.flags & CASTLE:
+                if end & 7 == 6:
+                    self.put_piece(end + 1, self.remove_piece(end - 1))
+                else:
+                    self.put_piece(end - 2, self.remove_piece(end + 1))
 
-            if move.enpassant():
-                self.board[move.start_row][move.end_col] = move.piece_captured
-                self.board[move.end_row][move.end_col] = "--"
-
-            else:
-                self.board[move.end_row][move.end_col] = move.piece_captured
+            if move.flags & ENPASSANT:
+                self.put_piece((start & 56) | (end & 7), move.piece_captured)
+            elif move.piece_captured != "--":
+                self.put_piece(end, move.piece_captured)
 
             self.white_move = not self.white_move  # turn changes
+            self.zobrist_key = key
             # updating king location
             if move.piece_moved == "wK":
-                self.white_king_loc = (move.start_row, move.start_col)
+                self.white_king_loc = (start >> 3, start & 7)
             elif move.piece_moved == "bK":
-                self.black_king_loc = (move.start_row, move.start_col)
+                self.black_king_loc = (start >> 3, start & 7)
 
-    def get_valid_moves(self):
+    def get_valid_moves(self, cross_check=False):
+        """
+        legal moves for the side to move. cross_check also runs the make/check/undo filter and raises if the two
+        generators disagree.
+        """
         turn = "w" if self.white_move else "b"
-        moves = self.get_all_moves()
-        for i in range(len(moves) - 1, -1, -1):
-            self.make_move(moves[i], print_move=False)
-            if self.check(check_color=turn):
-                moves.remove(moves[i])
-            self.undo_move()
+        moves = None
+        if self.move_cache is not None:
+            moves = self.move_cache.get(self.zobrist_key)
+        if moves is None:
+            moves = self.get_legal_moves()
+            if self.move_cache is not None:
+                self.move_cache.store(self.zobrist_key, moves)
+        if cross_check:
+            expected = sorted(move.move_ID for move in self.get_filtered_moves())
+            if sorted(move.move_ID for move in moves) != expected:
+                raise AssertionError("legal move generator disagrees with filtered moves: "
+                                     + str(sorted(move.move_ID for move in moves)) + " != " + str(expected))
         if len(moves) == 0:
             if self.check(check_color=turn):
                 self.checkmate = True
@@ -100,176 +319,228 @@ class GameState:
             self.stalemate = False
         return moves
 
-    def check(self, check_color):
-        if check_color == "w":
-            r = self.white_king_loc[0]
-            c = self.white_king_loc[1]
-        else:
-            r = self.black_king_loc[0]
-            c = self.black_king_loc[1]
-
-        # orthogonal checks
-        directions = [(1, 0), (0, 1), (-1, 0), (0, -1)]
-        for d in directions:
-            for i in range(1, len(self.board)):
-                row = r + (d[0] * i)
-                col = c + (d[1] * i)
-                if (row in range(len(self.board))) and (col in range(len(self.board[0]))):
-                    if self.board[row][col] == "--":
-                        continue
-                    elif check_color == self.board[row][col][0]:
-                        break
-                    elif self.board[row][col][1] in ["P", "B", "N"]:
-                        break
-                    elif self.board[row][col][1] in ["R", "Q", "K"]:
-                        return True
-                else:
-                    break
-
-        # diagonal checks
-        directions = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
-        for d in directions:
-            for i in range(1, len(self.board)):
-                row = r + (d[0] * i)
-                col = c + (d[1] * i)
-                if (row in range(len(self.board))) and (col in range(len(self.board[0]))):
-                    if self.board[row][col] == "--":
-                        continue
-                    elif check_color == self.board[row][col][0]:
-                        break
-                    elif self.board[row][col][1] in ["R", "N"] or (self.board[row][col][1] == "P" and i > 1):
-                        break
-                    elif (self.board[row][col][1] in ["Q", "B", "K"]) or (self.board[row][col][1] == "P" and i == 1):
-                        return True
-                else:
-                    break
+    def get_filtered_moves(self):
+        """ legal moves found by making every pseudo-legal move and checking if it leaves the king in check """
+        turn = "w" if self.white_move else "b"
+        moves = self.get_all_moves()
+        for i in range(len(moves) - 1, -1, -1):
+            self.make_move(moves[i], print_move=False)
+            if self.check(check_color=turn):
+                del moves[i]
+            self.undo_move()
+        return moves
+
+    def get_legal_moves(self):
+        """ legal moves generated directly from the checkers and pinned pieces of the current position """
+        color = "w" if self.white_move else "b"
+        enemy = "b" if self.white_move else "w"
+        bitboards = self.bitboards
+        own = self.occupancy[color]
+        king = bitboards[color + "K"]
+        king_sq = king.bit_length() - 1
+        moves = []
 
-        # knight checks
-        rows = [r - 2, r - 2, r + 2, r + 2, r - 1, r + 1, r - 1, r + 1]
-        cols = [c + 1, c - 1, c + 1, c - 1, c + 2, c + 2, c - 2, c - 2]
-        for row, col in zip(rows, cols):
-            if (row in range(len(self.board))) and (col in range(len(self.board[0]))):
-                if self.board[row][col][0] != check_color and (self.board[row][col][1] == "N"):
-                    return True
+        pins, checkers, evasions = self.pins_and_checks(king, color, enemy)
+        leapers = ((KNIGHT_ATTACKS[king_sq] & bitboards[enemy + "N"]) |
+                   (PAWN_ATTACKS[color][king_sq] & bitboards[enemy + "P"]))
+        checkers |= leapers
+        evasions |= leapers  # squares a non-king move has to land on to get out of check
+
+        # king moves, the king is taken off the board so it can't hide behind itself from a slider
+        occupied = self.occupied ^ king
+        targets = KING_ATTACKS[king_sq] & ~own
+        safe = 0
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            if not self.attacked(bit, enemy, occupied):
+                safe |= bit
+        self.add_moves(king_sq, safe, moves)
+        if not checkers:
+            self.add_castle_moves(king_sq, moves)
+
+        if checkers & (checkers - 1):  # double check, only the king can move
+            return moves
+        if not checkers:
+            evasions = FULL
+
+        others = own ^ king
+        while others:
+            bit = others & -others
+            others ^= bit
+            sq = bit.bit_length() - 1
+            piece = self.squares[sq][1]
+            targets = self.target_functions[piece](sq) & ~own
+            if sq in pins:
+                targets &= pins[sq]
+            if piece == "P":
+                if self.enpassant_sq is not None and targets & (1 << self.enpassant_sq):
+                    # enpassant removes two pawns from a row, so it's checked by making the move
+                    targets ^= 1 << self.enpassant_sq
+                    move = Move(sq, self.enpassant_sq, color + "P", enemy + "P", ENPASSANT)
+                    self.make_move(move, print_move=False)
+                    if not self.check(check_color=color):
+                        moves.append(move)
+                    self.undo_move()
+                self.add_pawn_moves(sq, targets & evasions, moves)
+            else:
+                self.add_moves(sq, targets & evasions, moves)
+        return moves
+
+    def pins_and_checks(self, king, color, enemy):
+        """
+        looks along every line from the king to the enemy sliders on it. returns {square: ray} for own pieces pinned to
+        the king, where ray is every square from the king up to and including the pinning piece, along with a bitboard
+        of sliders giving check and the squares that block or capture them.
+        """
+        bitboards = self.bitboards
+        own = self.occupancy[color]
+        occupied = self.occupied
+        king_sq = king.bit_length() - 1
+        between = BETWEEN[king_sq]
+        queens = bitboards[enemy + "Q"]
+        pins = {}
+        checkers = 0
+        evasions = 0
+        sliders = ((ROOK_REACH[king_sq] & (bitboards[enemy + "R"] | queens)) |
+                   (BISHOP_REACH[king_sq] & (bitboards[enemy + "B"] | queens)))
+        while sliders:
+            bit = sliders & -sliders
+            sliders ^= bit
+            ray = between[bit.bit_length() - 1]
+            blockers = ray & occupied
+            if not blockers:
+                checkers |= bit
+                evasions |= ray | bit
+            elif not blockers & (blockers - 1) and blockers & own:  # a single piece in the way, and it's ours
+                pins[blockers.bit_length() - 1] = ray | bit
+        return pins, checkers, evasions
 
+    def check(self, check_color):
+        king = self.bitboards[check_color + "K"]
+        return self.attacked(king, "b" if check_color == "w" else "w")
+
+    def attacked(self, bb, by_color, occupied=None):
+        """ returns True if any square in bb is attacked by a piece of by_color """
+        bitboards = self.bitboards
+        if occupied is None:
+            occupied = self.occupied
+        knights = bitboards[by_color + "N"]
+        king = bitboards[by_color + "K"]
+        pawns = bitboards[by_color + "P"]
+        queens = bitboards[by_color + "Q"]
+        rooks = bitboards[by_color + "R"] | queens
+        bishops = bitboards[by_color + "B"] | queens
+        # a square is attacked by a pawn if a pawn of the other color on it would attack that pawn
+        pawn_table = PAWN_ATTACKS["b" if by_color == "w" else "w"]
+        while bb:
+            bit = bb & -bb
+            bb ^= bit
+            sq = bit.bit_length() - 1
+            if KNIGHT_ATTACKS[sq] & knights or KING_ATTACKS[sq] & king or pawn_table[sq] & pawns:
+                return True
+            # sliders are only traced when one stands on a line through the square
+            if ROOK_REACH[sq] & rooks and rook_attacks(sq, occupied) & rooks:
+                return True
+            if BISHOP_REACH[sq] & bishops and bishop_attacks(sq, occupied) & bishops:
+                return True
         return False
 
     def get_all_moves(self):
         moves = []
-        for r, c in np.ndindex(np.shape(self.board)):
-            turn = self.board[r][c][0]
-            if (turn == 'w' and self.white_move) or (turn == 'b' and not self.white_move):
-                piece = self.board[r][c][1]
-                self.move_functions[piece](r, c, moves)
+        own = self.occupancy["w" if self.white_move else "b"]
+        while own:
+            bit = own & -own
+            own ^= bit
+            sq = bit.bit_length() - 1
+            self.move_functions[self.squares[sq][1]](sq >> 3, sq & 7, moves)
         return moves
 
-    def enpassant_avl(self):
-        if len(self.move_log) > 0:
-            prev_move = self.move_log[-1]
-            if prev_move.piece_moved[1] == "P" and abs(prev_move.start_row - prev_move.end_row) == 2:  # checking if prev move was 2 sq pawn advance
-                if prev_move.end_row == r and abs(prev_move.end_col - c) == 1:
-                    if (r == 4 and prev_move.end_row == 4) or r == 5:
-                        return True
-        return None
+    def add_moves(self, start, targets, moves):
+        """ appends a move from start to every square in the targets bitboard """
+        squares = self.squares
+        piece = squares[start]
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            end = bit.bit_length() - 1
+            moves.append(Move(start, end, piece, squares[end]))
+
+    def add_pawn_moves(self, start, targets, moves):
+        """ same as add_moves, with a move for each promotion piece when the pawn reaches the last row """
+        squares = self.squares
+        piece = squares[start]
+        if self.enpassant_sq is not None and targets & (1 << self.enpassant_sq):
+            targets ^= 1 << self.enpassant_sq
+            moves.append(Move(start, self.enpassant_sq, piece, ("b" if piece[0] == "w" else "w") + "P", ENPASSANT))
+        promotions = targets & PROMOTION_ROWS
+        self.add_moves(start, targets ^ promotions, moves)
+        while promotions:
+            bit = promotions & -promotions
+            promotions ^= bit
+            end = bit.bit_length() - 1
+            for choice in PROMOTION_PIECES:
+                moves.append(Move(start, end, piece, squares[end], promotion_choice=choice))
+
+    def add_castle_moves(self, start, moves):
+        """ castling moves for the king on start, the king can't castle out of, through or into check """
+        color = "w" if self.white_move else "b"
+        rights = self.castling_rights & ((WHITE_KINGSIDE | WHITE_QUEENSIDE) if self.white_move else
+                                         (BLACK_KINGSIDE | BLACK_QUEENSIDE))
+        for right, (king_sq, end, empty, path) in CASTLES.items():
+            if rights & right and start == king_sq and not self.occupied & empty and self.squares[king_sq] == color + "K":
+                rook_sq = king_sq + 3 if end > king_sq else king_sq - 4
+                if self.squares[rook_sq] == color + "R" and not self.attacked(path, "b" if self.white_move else "w"):
+                    moves.append(Move(start, end, color + "K", "--", CASTLE))
+
+    def pawn_targets(self, sq):
+        bit = 1 << sq
+        empty = FULL ^ self.occupied
+        if self.white_move:
+            single = bit >> 8 & empty  # 1 square forward
+            double = (single & ROW_5) >> 8 & empty  # 2 squares forward
+            enemy = self.occupancy["b"]
+            color = "w"
+        else:  # black pawns
+            single = bit << 8 & empty
+            double = (single & ROW_2) << 8 & empty
+            enemy = self.occupancy["w"]
+            color = "b"
+        # captures, including onto the enpassant square left behind by a 2 square pawn advance
+        if self.enpassant_sq is not None:
+            enemy |= 1 << self.enpassant_sq
+        return single | double | (PAWN_ATTACKS[color][sq] & enemy)
 
-    def get_pawn_moves(self, r, c, moves):
+    def rook_targets(self, sq):
+        return rook_attacks(sq, self.occupied)
 
-        # checking if enpassant available
-        enpassant_available = False
-        prev_move = None
-        if len(self.move_log) > 0:
-            prev_move = self.move_log[-1]
-            if prev_move.piece_moved[1] == "P" and abs(prev_move.start_row - prev_move.end_row) == 2:  # checking if prev move was 2 sq pawn advance
-                if prev_move.end_row == r and abs(prev_move.end_col - c) == 1:
-                    if (r == 4 and prev_move.end_row == 4) or r == 5:
-                        enpassant_available = True
+    def bishop_targets(self, sq):
+        return bishop_attacks(sq, self.occupied)
 
-        if self.white_move:
-            if self.board[r - 1][c] == "--":  # 1 square forward
-                moves.append(Move((r, c), (r - 1, c), self))
-                if r == 6 and self.board[r - 2][c] == "--":  # 2 squares forward
-                    moves.append(Move((r, c), (r - 2, c), self))
-            if c > 0 and self.board[r - 1][c - 1][0] == "b":  # left capture
-                moves.append(Move((r, c), (r - 1, c - 1), self))
-            if c < 7 and self.board[r - 1][c + 1][0] == "b":  # right capture
-                moves.append(Move((r, c), (r - 1, c + 1), self))
-            if enpassant_available:
-                if r == 3 and c > 0 and prev_move.end_col == c - 1:  # left enpassant
-                    moves.append(Move((r, c), (r - 1, c - 1), self))
-                if r == 3 and c < 7 and prev_move.end_col == c + 1:  # right enpassant
-                    moves.append(Move((r, c), (r - 1, c + 1), self))
+    def queen_targets(self, sq):
+        return queen_attacks(sq, self.occupied)
 
+    def knight_targets(self, sq):
+        return KNIGHT_ATTACKS[sq]
 
-        else:  # black pawns
-            if self.board[r + 1][c] == "--":  # 1 square forward
-                moves.append(Move((r, c), (r + 1, c), self))
-                if r == 1 and self.board[r + 2][c] == "--":  # 2 squares forward
-                    moves.append(Move((r, c), (r + 2, c), self))
-            if c > 0 and self.board[r + 1][c - 1][0] == "w":  # left capture
-                moves.append(Move((r, c), (r + 1, c - 1), self))
-            if c < 7 and self.board[r + 1][c + 1][0] == "w":  # right capture
-                moves.append(Move((r, c), (r + 1, c + 1), self))
-            if enpassant_available:
-                if r == 4 and c > 0 and prev_move.end_col == c - 1:  # left enpassant
-                    moves.append(Move((r, c), (r + 1, c - 1), self))
-                if r == 4 and c < 7 and prev_move.end_col == c + 1:  # right enpassant
-                    moves.append(Move((r, c), (r + 1, c + 1), self))
+    def king_targets(self, sq):
+        return KING_ATTACKS[sq]
+
+    def get_pawn_moves(self, r, c, moves):
+        self.add_pawn_moves(r * 8 + c, self.pawn_targets(r * 8 + c), moves)
 
     def get_rook_moves(self, r, c, moves):
-        directions = [(1, 0), (0, 1), (-1, 0), (0, -1)]
-        for d in directions:
-            for i in range(1, len(self.board)):
-                row = r + (d[0] * i)
-                col = c + (d[1] * i)
-                if (row in range(len(self.board))) and (col in range(len(self.board[0]))):
-                    if self.board[row][col] == "--":
-                        moves.append(Move((r, c), (row, col), self))
-                        continue
-                    if (self.white_move and self.board[row][col][0] == "b") or (not self.white_move and self.board[row][col][0] == "w"):
-                        moves.append(Move((r, c), (row, col), self))
-                        break
-                    if (self.white_move and self.board[row][col][0] == "w") or (not self.white_move and self.board[row][col][0] == "b"):
-                        break
-                else:
-                    break
+        self.add_moves(r * 8 + c, self.rook_targets(r * 8 + c) & ~self.occupancy["w" if self.white_move else "b"], moves)
 
     def get_bishop_moves(self, r, c, moves):
-        directions = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
-        for d in directions:
-            for i in range(1, len(self.board)):
-                row = r + (d[0] * i)
-                col = c + (d[1] * i)
-                if (row in range(len(self.board))) and (col in range(len(self.board[0]))):
-                    if self.board[row][col] == "--":
-                        moves.append(Move((r, c), (row, col), self))
-                        continue
-                    if (self.white_move and self.board[row][col][0] == "b") or (not self.white_move and self.board[row][col][0] == "w"):
-                        moves.append(Move((r, c), (row, col), self))
-                        break
-                    if (self.white_move and self.board[row][col][0] == "w") or (not self.white_move and self.board[row][col][0] == "b"):
-                        break
-                else:
-                    break
+        self.add_moves(r * 8 + c, self.bishop_targets(r * 8 + c) & ~self.occupancy["w" if self.white_move else "b"], moves)
 
     def get_knight_moves(self, r, c, moves):
-        rows = [r - 2, r - 2, r + 2, r + 2, r - 1, r + 1, r - 1, r + 1]
-        cols = [c + 1, c - 1, c + 1, c - 1, c + 2, c + 2, c - 2, c - 2]
-        for row, col in zip(rows, cols):
-            if (row in range(len(self.board))) and (col in range(len(self.board[0]))):
-                if self.board[row][col] == "--":
-                    moves.append(Move((r, c), (row, col), self))
-                if (self.white_move and self.board[row][col][0] == "b") or (not self.white_move and self.board[row][col][0] == "w"):
-                    moves.append(Move((r, c), (row, col), self))
+        self.add_moves(r * 8 + c, self.knight_targets(r * 8 + c) & ~self.occupancy["w" if self.white_move else "b"], moves)
 
     def get_king_moves(self, r, c, moves):
-        rows = [r - 1, r + 1, r, r, r - 1, r - 1, r + 1, r + 1]
-        cols = [c, c, c - 1, c + 1, c - 1, c + 1, c - 1, c + 1]
-        for row, col in zip(rows, cols):
-            if (row in range(len(self.board))) and (col in range(len(self.board[0]))):
-                if self.board[row][col] == "--":
-                    moves.append(Move((r, c), (row, col), self))
-                if (self.white_move and self.board[row][col][0] == "b") or (not self.white_move and self.board[row][col][0] == "w"):
-                    moves.append(Move((r, c), (row, col), self))
+        self.add_moves(r * 8 + c, self.king_targets(r * 8 + c) & ~self.occupancy["w" if self.white_move else "b"], moves)
+        self.add_castle_moves(r * 8 + c, moves)
 
     def get_queen_moves(self, r, c, moves):
         self.get_rook_moves(r, c, moves)
@@ -277,77 +548,111 @@ class GameState:
 
 
 class Move:
-    def __init__(self, start_sq, end_sq, gs):
-        self.gs = gs
-        self.board = self.gs.board
-        self.start_row = start_sq[0]
-        self.end_row = end_sq[0]
-        self.start_col = start_sq[1]
-        self.end_col = end_sq[1]
-        self.piece_moved = self.gs.board[self.start_row][self.start_col]
-        self.piece_captured = self.gs.board[self.end_row][self.end_col]
-        if self.enpassant():
-            if self.piece_moved[0] == "w":
-                self.piece_captured = "bP"
-            else:
-                self.piece_captured = "wP"
-        self.move_ID = int(str(self.start_row) + str(self.start_col) + str(self.end_row) + str(self.end_col))
+    """
+    a move stored as its start and end squares (row * 8 + col), the pieces involved and ENPASSANT/CASTLE flag bits.
+    moves don't keep a reference to the game state, so move lists don't keep old positions alive.
+    """
+    __slots__ = ("start", "end", "piece_moved", "piece_captured", "flags", "promotion_choice")
+
+    def __init__(self, start, end, piece_moved, piece_captured, flags=0, promotion_choice=None):
+        self.start = start
+        self.end = end
+        self.piece_moved = piece_moved
+        self.piece_captured = piece_captured  # the captured pawn for enpassant, -- if nothing is captured
+        self.flags = flags
+        self.promotion_choice = promotion_choice  # piece a pawn becomes when it reaches the last row
+
+    @classmethod
+    def from_squares(cls, start_sq, end_sq, gs, promotion_choice="Q"):
+        """ builds the move between two (row, col) squares in the given position, e.g. from mouse clicks """
+        start = start_sq[0] * 8 + start_sq[1]
+        end = end_sq[0] * 8 + end_sq[1]
+        piece_moved = gs.squares[start]
+        piece_captured = gs.squares[end]
+        flags = 0
+        if piece_moved[1] == "P":
+            if end == gs.enpassant_sq:
+                flags = ENPASSANT
+                piece_captured = ("b" if piece_moved[0] == "w" else "w") + "P"
+            if not (1 << end) & PROMOTION_ROWS:
+                promotion_choice = None
+        else:
+            promotion_choice = None
+            if piece_moved[1] == "K" and abs(start - end) == 2:
+                flags = CASTLE
+        return cls(start, end, piece_moved, piece_captured, flags, promotion_choice)
+
+    @property
+    def start_row(self):
+        return self.start >> 3
+
+    @property
+    def start_col(self):
+        return self.start & 7
+
+    @property
+    def end_row(self):
+        return self.end >> 3
+
+    @property
+    def end_col(self):
+        return self.end & 7
+
+    @property
+    def is_enpassant(self):
+        return bool(self.flags & ENPASSANT)
+
+    @property
+    def is_castle(self):
+        return bool(self.flags & CASTLE)
+
+    @property
+    def move_ID(self):
+        """ start | end << 6 | promotion << 12, unique among the moves of a position """
+        promotion = PROMOTION_PIECES.index(self.promotion_choice) + 1 if self.promotion_choice else 0
+        return self.start | self.end << 6 | promotion << 12
 
     def __eq__(self, other):
         if isinstance(other, Move):
             return self.move_ID == other.move_ID
         return False
 
-    def get_notation(self):
+    def __hash__(self):
+        return self.move_ID
+
+    def __repr__(self):
+        return "Move(" + self.get_uci_notation() + ")"
+
+    def get_notation(self, gs=None):
         """
-        outputs out notation for each move. ADD CASTLING, DISAMBIGUATION, CHECK, CHECKMATE, STALEMATE.
+        short algebraic notation for the move, without disambiguation (notation.san_moves gives full SAN for a move
+        list). gs is the game state after the move was made, used to mark checks.
         """
-        board_row = board_col = np.arange(8)
-        letters = string.ascii_lowercase[:8]
-        numbers = reversed([str(x) for x in np.arange(9)[1:]])
-
-        # mapping square
-        rank_map = {x: y for x, y in zip(board_row, numbers)}
-        file_map = {x: y for x, y in zip(board_col, letters)}
-        square = file_map[self.end_col] + rank_map[self.end_row]
-
-        # mapping piece
-        piece_map = {x: x for x in ["K", "Q", "R", "B", "N"]}
-        piece_map["P"] = ""
-
-        # check color
-        rev_color_map = {"w": "b", "b": "w"}
-        check_color = rev_color_map[self.piece_moved[0]]
-
-        # empty output
-        output = ""
-
-        if self.piece_moved != "--":
-            piece = piece_map[self.piece_moved[1]]
-            if self.piece_captured == "--":
-                output = piece + square
-            else:
-                if self.piece_moved[1] == "P":
-                    piece = file_map[self.start_col]
-                output = piece + "x" + square
-            if self.promotion():
-                output += "=Q"
-            if self.gs.check(check_color=check_color):
-                output += "+"
-            return output
-        else:
+        if self.piece_moved == "--":
             return None
+        piece = self.piece_moved[1]
+        capture = "x" if self.piece_captured != "--" else ""
+        if self.is_castle:
+            output = "O-O" if self.end & 7 == 6 else "O-O-O"
+        elif piece == "P":
+            output = (FILES[self.start & 7] if capture else "") + capture + SQUARE_NAMES[self.end]
+        else:
+            output = piece + capture + SQUARE_NAMES[self.end]
+        if self.promotion():
+            output += "=" + self.promotion_choice
+        if gs is not None and gs.check(check_color="b" if self.piece_moved[0] == "w" else "w"):
+            output += "+"
+        return output
+
+    def get_uci_notation(self):
+        """ coordinate notation, e.g. e2e4 or e7e8q """
+        output = SQUARE_NAMES[self.start] + SQUARE_NAMES[self.end]
+        if self.promotion():
+            output += self.promotion_choice.lower()
+        return output
 
     def promotion(self):
-        if self.piece_moved[1] == "P":
-            if (self.piece_moved[0] == "w" and self.end_row == 0) or (self.piece_moved[0] == "b" and self.end_row == 7):
-                return True
-        return False
+        return self.promotion_choice is not None
 
     def enpassant(self):
-        if len(self.gs.move_log) > 0:
-            prev_move = self.gs.move_log[-1]
-            if prev_move.piece_moved[1] == "P" and abs(prev_move.start_row - prev_move.end_row) == 2:  # checking if prev move was 2 sq pawn advance
-                if self.start_row == prev_move.end_row and self.end_col == prev_move.end_col:
-                    return True
-        return False
+        return self.is_enpassant
@@ -1,9 +1,18 @@
 """
 Driver file. Handles user input and displays game state.
+Move generation and engine searches run on a background thread, so the window keeps responding while they run.
 """
 
+import copy
+import os
+import queue
+import threading
+
 import pygame as p
-import ChessEngine
+from Chess import ChessEngine
+from Chess.notation import san_moves
+from Chess.polyglot import OpeningBook
+from Chess.search import Search
 
 OFFSET = 30
 WIDTH = HEIGHT = 512
@@ -12,28 +21,80 @@ SQ_SIZE = HEIGHT // DIM
 MAX_FPS = 15
 IMAGES = {}
 
+# False makes the engine play that side
+WHITE_HUMAN = True
+BLACK_HUMAN = True
+ENGINE_TIME_MS = 2000
+# a Polyglot .bin book the engine plays from before it starts searching, None to always search
+BOOK_PATH = None
+
 
 def load_images():
     """ initialize dictionary of images, called only once in main """
     pieces = ["bR", "bN", "bB", "bQ", "bK", "bP", "wR", "wN", "wB", "wQ", "wK", "wP"]
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chess_images")
     for piece in pieces:
-        # print current path 
-        path = "C:\\Users\\suvan\\ChessEngine\\Chess_Engine\\Chess\\chess_images\\"
-        # import images grom path using names of pieces
-        #IMAGES[piece] = p.transform.scale(p.image.load(path + piece + ".png"), (SQ_SIZE, SQ_SIZE))
-        IMAGES[piece] = p.transform.scale(p.image.load("Chess\\chess_images\\" + piece + ".png"), (SQ_SIZE, SQ_SIZE))
+        # import images from path using names of pieces, pawn images are named bp.png and wp.png
+        file_name = piece[0] + piece[1].replace("P", "p") + ".png"
+        IMAGES[piece] = p.transform.scale(p.image.load(os.path.join(path, file_name)), (SQ_SIZE, SQ_SIZE))
+
+
+class EngineWorker:
+    """
+    computes valid moves, and the engine's move when it is to play, on a background thread. requests carry an id so
+    results for a position the game has already left (after an undo, say) can be dropped.
+    """
+
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.search = Search()
+        self.book = OpeningBook(BOOK_PATH) if BOOK_PATH else None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, request_id, gs, engine_to_move):
+        """ queues work on a copy of gs, so the main thread can keep drawing the real one """
+        self.search.stop()  # a search for an earlier position is no longer needed
+        self.requests.put((request_id, copy.deepcopy(gs), engine_to_move))
+
+    def run(self):
+        while True:
+            request_id, gs, engine_to_move = self.requests.get()
+            try:
+                while True:  # skip straight to the newest request
+                    request_id, gs, engine_to_move = self.requests.get_nowait()
+            except queue.Empty:
+                pass
+            if request_id is None:
+                return
+            valid_moves = gs.get_valid_moves()
+            engine_move = None
+            if engine_to_move and valid_moves:
+                if self.book is not None:
+                    engine_move = self.book.choose(gs)
+                if engine_move is None:
+                    engine_move = self.search.search(gs, time_ms=ENGINE_TIME_MS).best_move
+            self.results.put((request_id, valid_moves, engine_move))
+
+    def close(self):
+        self.search.stop()
+        self.requests.put((None, None, None))
 
 
 def main():
     p.init()
     screen = p.display.set_mode((WIDTH, HEIGHT))
     clock = p.time.Clock()
-    screen.fill(p.Color("white"))
+    load_images()
+    background = draw_background()
     gs = ChessEngine.GameState()
-    valid_moves = gs.get_valid_moves()
-    print([x.get_notation() for x in valid_moves])
+    worker = EngineWorker()
+    request_id = 0
+    worker.submit(request_id, gs, engine_to_move(gs))
+    valid_moves = []  # empty until the worker has answered for the current position
     move_made = False
-    load_images()
+    drawn = None  # pieces as last drawn, None forces a full redraw
     running = True
     sq_selected = ()
     sq_clicks = []
@@ -41,6 +102,8 @@ def main():
         for e in p.event.get():
             if e.type == p.QUIT:
                 running = False
+            elif e.type == p.VIDEOEXPOSE:
+                drawn = None  # window was covered, redraw all of it
             # mouse handlers
             elif e.type == p.MOUSEBUTTONDOWN:
                 location = p.mouse.get_pos()
@@ -53,9 +116,9 @@ def main():
                     sq_selected = (row, col)
                     sq_clicks.append(sq_selected)
                 if len(sq_clicks) == 2:
-                    move = ChessEngine.Move(sq_clicks[0], sq_clicks[1], gs)
-                    if move in valid_moves:
-                        gs.make_move(move)
+                    move = ChessEngine.Move.from_squares(sq_clicks[0], sq_clicks[1], gs)
+                    if move in valid_moves and not engine_to_move(gs):
+                        gs.make_move(move, print_move=True)
                         move_made = True
                         sq_clicks = []
                         sq_selected = ()
@@ -67,19 +130,63 @@ def main():
                     gs.undo_move()
                     move_made = True # we need to update the valid moves
 
+        try:
+            result_id, moves, engine_move = worker.results.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            if result_id == request_id:
+                valid_moves = moves
+                print(san_moves(gs, valid_moves))
+                if engine_move is not None:
+                    gs.make_move(engine_move, print_move=True)
+                    move_made = True
+
         if move_made:
-            valid_moves = gs.get_valid_moves()
-            print([x.get_notation() for x in valid_moves])
+            request_id += 1
+            valid_moves = []
+            worker.submit(request_id, gs, engine_to_move(gs))
             move_made = False
 
-        draw_gamestate(screen, gs)
+        drawn = draw_gamestate(screen, background, gs, drawn)
         clock.tick(MAX_FPS)
-        p.display.flip()
+
+    worker.close()
 
 
-def draw_gamestate(screen, gs):
-    draw_board(screen)
-    draw_pieces(screen, gs.board)
+def engine_to_move(gs):
+    return not (WHITE_HUMAN if gs.white_move else BLACK_HUMAN)
+
+
+def draw_gamestate(screen, background, gs, drawn):
+    """
+    draws only the squares whose piece changed since the pieces in drawn were drawn, and updates just those parts of
+    the display. returns the pieces now on screen.
+    """
+    squares = list(gs.squares)
+    if drawn is None:
+        screen.blit(background, (0, 0))
+        draw_pieces(screen, gs.board)
+        p.display.flip()
+        return squares
+    dirty = []
+    for sq, piece in enumerate(squares):
+        if piece != drawn[sq]:
+            rect = p.Rect((sq & 7) * SQ_SIZE, (sq >> 3) * SQ_SIZE, SQ_SIZE, SQ_SIZE)
+            screen.blit(background, rect, rect)
+            if piece != "--":
+                screen.blit(IMAGES[piece], rect)
+            dirty.append(rect)
+    if dirty:
+        p.display.update(dirty)
+    return squares
+
+
+def draw_background():
+    """ the empty board, drawn once and copied from when squares need redrawing """
+    background = p.Surface((WIDTH, HEIGHT))
+    draw_board(background)
+    return background
 
 
 def draw_board(screen):
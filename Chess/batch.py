@@ -0,0 +1,211 @@
+"""
+Vectorized analysis of many positions at once. Positions are packed into an (N, 12) array of uint64 bitboards, one
+per piece in ChessEngine.PIECES order, and evaluations, attack maps, check flags and pseudo-legal move counts are
+computed with NumPy operations over the whole batch.
+
+    for chunk in analyse_stream(fens, chunk_size=8192):
+        labels.extend(chunk["eval"])
+"""
+
+import itertools
+
+import numpy as np
+
+from .ChessEngine import GameState, PIECES, ORTHOGONAL, DIAGONAL, FILE_A, FILE_B, FILE_G, FILE_H, ROW_2, ROW_5, \
+    PROMOTION_ROWS
+from .evaluation import MG_TABLE, EG_TABLE, PHASE_TABLE, MAX_PHASE
+from .tables import KNIGHT_ATTACKS, KING_ATTACKS
+
+U64 = np.uint64
+NOT_A = U64(~FILE_A & (1 << 64) - 1)
+NOT_H = U64(~FILE_H & (1 << 64) - 1)
+NOT_AB = U64(~(FILE_A | FILE_B) & (1 << 64) - 1)
+NOT_GH = U64(~(FILE_G | FILE_H) & (1 << 64) - 1)
+
+# evaluation tables flattened to match the (N, 12 * 64) piece planes
+MG_VECTOR = np.array([MG_TABLE[piece][sq] for piece in PIECES for sq in range(64)], dtype=np.int64)
+EG_VECTOR = np.array([EG_TABLE[piece][sq] for piece in PIECES for sq in range(64)], dtype=np.int64)
+PHASE_VECTOR = np.array([PHASE_TABLE[piece] for piece in PIECES], dtype=np.int64)
+
+SQUARE_BITS = np.array([1 << sq for sq in range(64)], dtype=U64)
+KNIGHT_TABLE = np.array(KNIGHT_ATTACKS, dtype=U64)
+KING_TABLE = np.array(KING_ATTACKS, dtype=U64)
+
+_POPCOUNT_8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+FEN_PIECES = {("w" if char.isupper() else "b") + char.upper(): char for char in "PNBRQKpnbrqk"}
+PIECE_INDEX = {FEN_PIECES[piece]: i for i, piece in enumerate(PIECES)}
+
+
+def popcount(a):
+    """ number of set bits in every element of a uint64 array """
+    if hasattr(np, "bitwise_count"):  # numpy 2.0+
+        return np.bitwise_count(a).astype(np.int64)
+    a = np.ascontiguousarray(a, dtype="<u8")
+    return _POPCOUNT_8[a.view(np.uint8)].reshape(a.shape + (8,)).sum(axis=-1, dtype=np.int64)
+
+
+def pack(positions):
+    """
+    packs GameStates or FEN strings into (bitboards, white_move): an (N, 12) uint64 array and an (N,) bool array
+    """
+    positions = list(positions)
+    bitboards = np.zeros((len(positions), 12), dtype=U64)
+    white_move = np.zeros(len(positions), dtype=bool)
+    for i, position in enumerate(positions):
+        if isinstance(position, GameState):
+            bitboards[i] = [position.bitboards[piece] for piece in PIECES]
+            white_move[i] = position.white_move
+        else:
+            placement, side = position.split()[:2]
+            boards = [0] * 12
+            sq = 0
+            for char in placement:
+                if char.isdigit():
+                    sq += int(char)
+                elif char != "/":
+                    boards[PIECE_INDEX[char]] |= 1 << sq
+                    sq += 1
+            bitboards[i] = boards
+            white_move[i] = side == "w"
+    return bitboards, white_move
+
+
+def planes(bitboards):
+    """ (N, 12) bitboards unpacked to (N, 12, 64) uint8 piece planes """
+    as_bytes = np.ascontiguousarray(bitboards, dtype="<u8").view(np.uint8).reshape(bitboards.shape + (8,))
+    return np.unpackbits(as_bytes, axis=-1, bitorder="little")
+
+
+def evaluate(bitboards, white_move):
+    """ evaluation.evaluate for every position, in centipawns from the point of view of the side to move """
+    piece_planes = planes(bitboards)
+    flat = piece_planes.reshape(len(bitboards), 12 * 64).astype(np.int64)
+    mg_score = flat @ MG_VECTOR
+    eg_score = flat @ EG_VECTOR
+    phase = np.minimum(piece_planes.sum(axis=2, dtype=np.int64) @ PHASE_VECTOR, MAX_PHASE)
+    score = (mg_score * phase + eg_score * (MAX_PHASE - phase)) // MAX_PHASE
+    return np.where(white_move, score, -score)
+
+
+def shift(bb, amount, mask):
+    """ shifts bitboards towards row 7 for positive amounts, masking off squares that wrapped around the board """
+    if amount > 0:
+        return (bb << U64(amount)) & mask
+    return (bb >> U64(-amount)) & mask
+
+
+def knight_attacks_batch(bb):
+    return (shift(bb, -15, NOT_A) | shift(bb, -17, NOT_H) | shift(bb, 17, NOT_A) | shift(bb, 15, NOT_H) |
+            shift(bb, -6, NOT_AB) | shift(bb, 10, NOT_AB) | shift(bb, -10, NOT_GH) | shift(bb, 6, NOT_GH))
+
+
+def king_attacks_batch(bb):
+    sides = shift(bb, 1, NOT_A) | shift(bb, -1, NOT_H)
+    row = bb | sides
+    return sides | (row >> U64(8)) | (row << U64(8))
+
+
+def pawn_attacks_batch(bb, white):
+    if white:
+        return shift(bb, -9, NOT_H) | shift(bb, -7, NOT_A)
+    return shift(bb, 7, NOT_H) | shift(bb, 9, NOT_A)
+
+
+def slider_attacks_batch(bb, occupied, directions):
+    """
+    squares attacked along the (shift, mask) rays in directions from every piece in bb, each ray stopping at the first
+    occupied square. occupied has to broadcast against bb
+    """
+    attacks = np.zeros(np.broadcast(bb, occupied).shape, dtype=U64)
+    empty = ~occupied
+    for amount, mask in directions:
+        ray = bb
+        for _ in range(7):
+            ray = shift(ray, amount, U64(mask))
+            attacks |= ray
+            ray = ray & empty
+    return attacks
+
+
+def attack_maps(bitboards):
+    """ (white_attacks, black_attacks), every square attacked by each color in each position """
+    occupied = np.bitwise_or.reduce(bitboards, axis=1)
+    maps = []
+    for offset, white in ((0, True), (6, False)):
+        pawns, knights, bishops, rooks, queens, king = (bitboards[:, offset + i] for i in range(6))
+        maps.append(pawn_attacks_batch(pawns, white) | knight_attacks_batch(knights) | king_attacks_batch(king) |
+                    slider_attacks_batch(bishops | queens, occupied, DIAGONAL) |
+                    slider_attacks_batch(rooks | queens, occupied, ORTHOGONAL))
+    return maps[0], maps[1]
+
+
+def in_check(bitboards, white_move, maps=None):
+    """ True for every position where the side to move is in check """
+    white_attacks, black_attacks = maps if maps is not None else attack_maps(bitboards)
+    return np.where(white_move, bitboards[:, 5] & black_attacks, bitboards[:, 11] & white_attacks) != 0
+
+
+def count_moves(bitboards, white_move):
+    """
+    pseudo-legal move count of the side to move in every position, promotions counting once for each piece.
+    castling and enpassant aren't included since they depend on state the bitboards don't hold.
+    """
+    white_move = np.asarray(white_move, dtype=bool)
+    own_boards = np.where(white_move[:, None], bitboards[:, :6], bitboards[:, 6:])
+    enemy = np.bitwise_or.reduce(np.where(white_move[:, None], bitboards[:, 6:], bitboards[:, :6]), axis=1)
+    own = np.bitwise_or.reduce(own_boards, axis=1)
+    occupied = own | enemy
+    empty = ~occupied
+    not_own = ~own
+
+    # pawns, pushes and captures done set-wise for each color and the side to move's result kept
+    pawns = own_boards[:, 0]
+    counts = np.zeros(len(bitboards), dtype=np.int64)
+    for white in (True, False):
+        if white:
+            single = (pawns >> U64(8)) & empty
+            double = ((single & U64(ROW_5)) >> U64(8)) & empty
+        else:
+            single = (pawns << U64(8)) & empty
+            double = ((single & U64(ROW_2)) << U64(8)) & empty
+        left, right = ((shift(pawns, -9, NOT_H), shift(pawns, -7, NOT_A)) if white else
+                       (shift(pawns, 7, NOT_H), shift(pawns, 9, NOT_A)))
+        total = popcount(double)
+        for targets in (single, left & enemy, right & enemy):
+            total += popcount(targets) + 3 * popcount(targets & U64(PROMOTION_ROWS))
+        counts = np.where(white_move == white, total, counts)
+
+    # pieces one square at a time, an (N, 64) array holding each piece's own bit
+    def singles(board):
+        return np.where(planes(board[:, None])[:, 0] != 0, SQUARE_BITS, U64(0))
+
+    def count(targets, board):
+        return (popcount(targets & not_own[:, None]) * (planes(board[:, None])[:, 0] != 0)).sum(axis=1)
+
+    counts += count(KNIGHT_TABLE[None, :], own_boards[:, 1])
+    counts += count(KING_TABLE[None, :], own_boards[:, 5])
+    for board, directions in ((own_boards[:, 2] | own_boards[:, 4], DIAGONAL),
+                              (own_boards[:, 3] | own_boards[:, 4], ORTHOGONAL)):
+        counts += count(slider_attacks_batch(singles(board), occupied[:, None], directions), board)
+    return counts
+
+
+def analyse(bitboards, white_move):
+    """ evaluation, attack maps, check flags and move counts for a packed batch, as a dict of arrays """
+    maps = attack_maps(bitboards)
+    return {"eval": evaluate(bitboards, white_move), "white_attacks": maps[0], "black_attacks": maps[1],
+            "in_check": in_check(bitboards, white_move, maps), "moves": count_moves(bitboards, white_move)}
+
+
+def analyse_stream(positions, chunk_size=4096):
+    """
+    analyse() over any iterable of GameStates or FEN strings, chunk_size positions at a time, so memory use stays
+    bounded however many positions there are. yields one dict of arrays per chunk.
+    """
+    positions = iter(positions)
+    while True:
+        chunk = list(itertools.islice(positions, chunk_size))
+        if not chunk:
+            return
+        yield analyse(*pack(chunk))
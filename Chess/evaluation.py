@@ -0,0 +1,122 @@
+"""
+Material and piece-square evaluation. GameState keeps running middlegame and endgame totals and the game phase,
+updated whenever a piece is put on or taken off a square, so evaluating a position doesn't scan the board.
+"""
+
+# material values for the middlegame and endgame
+MG_VALUES = {"P": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 0}
+EG_VALUES = {"P": 120, "N": 300, "B": 320, "R": 520, "Q": 920, "K": 0}
+
+# game phase counts down from 24 with all minor and major pieces on the board to 0 with none left
+PHASE_VALUES = {"P": 0, "N": 1, "B": 1, "R": 2, "Q": 4, "K": 0}
+MAX_PHASE = 24
+
+# piece-square bonuses for white, laid out like GameState.board (row 0 is the 8th rank)
+PAWN_MG = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0]
+PAWN_EG = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5, 5, 5, 5, 5, 5, 5, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0]
+KNIGHT = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50]
+BISHOP = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20]
+ROOK = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0]
+QUEEN = [
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20]
+KING_MG = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20]
+KING_EG = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50]
+
+PST_MG = {"P": PAWN_MG, "N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN, "K": KING_MG}
+PST_EG = {"P": PAWN_EG, "N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN, "K": KING_EG}
+
+
+def _build_table(values, pst):
+    """ material plus piece-square score of every piece on every square, positive for white and negative for black """
+    table = {}
+    for piece_type, value in values.items():
+        # black's tables are white's mirrored top to bottom, sq ^ 56 flips the row
+        table["w" + piece_type] = [value + pst[piece_type][sq] for sq in range(64)]
+        table["b" + piece_type] = [-(value + pst[piece_type][sq ^ 56]) for sq in range(64)]
+    return table
+
+
+MG_TABLE = _build_table(MG_VALUES, PST_MG)
+EG_TABLE = _build_table(EG_VALUES, PST_EG)
+PHASE_TABLE = {color + piece_type: value for color in "wb" for piece_type, value in PHASE_VALUES.items()}
+
+
+def evaluate(gs):
+    """ score of the position in centipawns from the point of view of the side to move, from gs's running totals """
+    phase = min(gs.phase, MAX_PHASE)
+    score = (gs.mg_score * phase + gs.eg_score * (MAX_PHASE - phase)) // MAX_PHASE
+    return score if gs.white_move else -score
+
+
+def compute_scores(gs):
+    """ (mg_score, eg_score, phase) computed from scratch, the values GameState keeps up to date incrementally """
+    mg_score = eg_score = phase = 0
+    for sq, piece in enumerate(gs.squares):
+        if piece != "--":
+            mg_score += MG_TABLE[piece][sq]
+            eg_score += EG_TABLE[piece][sq]
+            phase += PHASE_TABLE[piece]
+    return mg_score, eg_score, phase
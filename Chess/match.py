@@ -0,0 +1,235 @@
+"""
+Engine against engine matches. Games between two search configurations are played concurrently on a process pool,
+each finished game is appended to a PGN file straight away, and the match ends with the win/draw/loss record and the
+Elo difference with its 95% error margin.
+
+Every opening is played twice with the colors swapped, openings are random moves from the start position or FENs
+read from a file.
+
+usage: python -m Chess.match --games 1000 --engine name=new,nodes=20000 --engine name=old,nodes=20000 -o match.pgn
+"""
+
+import argparse
+import datetime
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from .ChessEngine import GameState, START_FEN
+from .notation import SANWriter
+from .pgn import write_game
+from .search import Search, MAX_PLY
+
+MAX_PLIES = 400  # games still going after this many plies are scored as draws
+
+
+class EngineConfig:
+    def __init__(self, name, depth=MAX_PLY, time_ms=None, nodes=None, tt_size_mb=16):
+        self.name = name
+        self.depth = depth
+        self.time_ms = time_ms  # per move
+        self.nodes = nodes  # per move
+        self.tt_size_mb = tt_size_mb
+
+    @classmethod
+    def parse(cls, text):
+        """
+        a config from "name=new,depth=6,time=100,nodes=20000,hash=16". name and at least one of depth, time and nodes
+        are required, a search without a limit would never finish its move
+        """
+        fields = dict(field.split("=", 1) for field in text.split(",") if field)
+        if "name" not in fields:
+            raise ValueError("engine config needs a name: " + text)
+        if not any(limit in fields for limit in ("depth", "time", "nodes")):
+            raise ValueError("engine config needs a depth, time or nodes limit: " + text)
+        return cls(fields["name"], int(fields.get("depth", MAX_PLY)),
+                   int(fields["time"]) if "time" in fields else None,
+                   int(fields["nodes"]) if "nodes" in fields else None, int(fields.get("hash", 16)))
+
+    def __repr__(self):
+        return "EngineConfig({}, depth={}, time_ms={}, nodes={})".format(self.name, self.depth, self.time_ms,
+                                                                         self.nodes)
+
+
+# each worker process's Search for every engine name, kept from game to game
+_searches = {}
+
+
+def _search_for(config):
+    search = _searches.get(config.name)
+    if search is None:
+        search = _searches[config.name] = Search(tt_size_mb=config.tt_size_mb)
+    return search
+
+
+def random_opening(rng, plies):
+    """ uci moves of plies random legal moves from the start position, fewer if the game ends before that """
+    gs = GameState()
+    moves = []
+    for _ in range(plies):
+        legal = gs.get_legal_moves()
+        if not legal:
+            break
+        move = rng.choice(legal)
+        gs.make_move(move)
+        moves.append(move.get_uci_notation())
+    return moves
+
+
+def game_over(gs, moves, max_plies=MAX_PLIES):
+    """ (result, termination) if the game in gs has ended, None otherwise. moves are the legal moves in gs """
+    if not moves:
+        if gs.check("w" if gs.white_move else "b"):
+            return ("0-1" if gs.white_move else "1-0"), "checkmate"
+        return "1/2-1/2", "stalemate"
+    if gs.halfmove_clock >= 100:
+        return "1/2-1/2", "fifty move rule"
+    if gs.repetition_count() >= 2:
+        return "1/2-1/2", "threefold repetition"
+    if gs.insufficient_material():
+        return "1/2-1/2", "insufficient material"
+    if len(gs.move_log) >= max_plies:
+        return "1/2-1/2", "adjudication"
+    return None
+
+
+def play_game(job):
+    """
+    plays one game, job is (index, fen, opening uci moves, white EngineConfig, black EngineConfig, max plies).
+    returns a dict with the index, the engine names, result, termination, plies, nodes and the game as PGN text
+    """
+    index, fen, opening, white, black, max_plies = job
+    start = time.perf_counter()
+    gs = GameState(fen)
+    sans = []
+    for uci in opening:
+        moves = gs.get_legal_moves()
+        move = next(move for move in moves if move.get_uci_notation() == uci)
+        sans.append(SANWriter(gs, moves).san(move))
+        gs.make_move(move)
+    for config in (white, black):
+        _search_for(config).tt.clear()  # a new game, like ucinewgame
+    nodes = 0
+    while True:
+        moves = gs.get_legal_moves()
+        ended = game_over(gs, moves, max_plies)
+        if ended is not None:
+            break
+        config = white if gs.white_move else black
+        result = _search_for(config).search(gs, depth=config.depth, time_ms=config.time_ms, nodes=config.nodes)
+        nodes += result.nodes
+        sans.append(SANWriter(gs, moves).san(result.best_move))
+        gs.make_move(result.best_move)
+    headers = {"Event": "match", "Site": "?", "Date": datetime.date.today().strftime("%Y.%m.%d"),
+               "Round": str(index + 1), "White": white.name, "Black": black.name, "Termination": ended[1]}
+    return {"index": index, "white": white.name, "black": black.name, "result": ended[0], "termination": ended[1],
+            "plies": len(sans), "nodes": nodes, "seconds": time.perf_counter() - start,
+            "pgn": write_game(headers, sans, ended[0], fen)}
+
+
+def elo(wins, draws, losses):
+    """ (Elo difference, 95% error margin) of an engine that scored wins, draws and losses """
+    games = wins + draws + losses
+    if not games:
+        return 0.0, 0.0
+    score = (wins + draws / 2) / games
+    deviation = math.sqrt((wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games)
+    margin = 1.96 * deviation / math.sqrt(games)
+    return _elo(score), (_elo(score + margin) - _elo(score - margin)) / 2
+
+
+def _elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)  # a perfect score is an unbounded difference
+    return 400 * math.log10(score / (1 - score))
+
+
+def match_jobs(first, second, games, openings, max_plies=MAX_PLIES):
+    """ jobs for play_game, openings is a list of (fen, uci moves) used in turn, each one for a pair of games """
+    for index in range(games):
+        fen, moves = openings[index // 2 % len(openings)]
+        white, black = (first, second) if index % 2 == 0 else (second, first)
+        yield index, fen, moves, white, black, max_plies
+
+
+def run_match(first, second, games, openings, output=None, processes=None, max_plies=MAX_PLIES, log=print):
+    """
+    plays games between first and second on processes worker processes, appending each game to output, a PGN path,
+    as it finishes. returns (wins, draws, losses) from first's point of view
+    """
+    processes = processes or os.cpu_count() or 1
+    wins = draws = losses = 0
+    start = time.perf_counter()
+    pgn_file = open(output, "a") if output else None
+    try:
+        with multiprocessing.Pool(processes) as pool:
+            jobs = match_jobs(first, second, games, openings, max_plies)
+            for finished, game in enumerate(pool.imap_unordered(play_game, jobs), 1):
+                if pgn_file is not None:
+                    pgn_file.write(game["pgn"])
+                    pgn_file.flush()
+                if game["result"] == "1/2-1/2":
+                    draws += 1
+                elif (game["result"] == "1-0") == (game["white"] == first.name):
+                    wins += 1
+                else:
+                    losses += 1
+                log("game {} {} - {} {} ({}), score {} +{} ={} -{}".format(
+                    finished, game["white"], game["black"], game["result"], game["termination"], first.name, wins,
+                    draws, losses))
+    finally:
+        if pgn_file is not None:
+            pgn_file.close()
+    elapsed = time.perf_counter() - start
+    difference, margin = elo(wins, draws, losses)
+    log("{} vs {}: +{} ={} -{}, elo {:+.1f} +/- {:.1f}, {:.0f} games/hour".format(
+        first.name, second.name, wins, draws, losses, difference, margin, games / elapsed * 3600 if elapsed else 0))
+    return wins, draws, losses
+
+
+def read_openings(path):
+    """ (fen, []) for every FEN or EPD line in path """
+    openings = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 4:
+                # EPD lines have operations where a FEN has its move counters
+                fen = fields[:6] if len(fields) >= 6 and fields[4].isdigit() else fields[:4]
+                openings.append((" ".join(fen), []))
+    return openings
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="play a match between two engine configurations")
+    parser.add_argument("--engine", action="append", required=True,
+                        help="name=...,depth=...,time=...(ms per move),nodes=...,hash=...(MB), given twice")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--processes", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("-o", "--output", help="PGN file games are appended to")
+    parser.add_argument("--openings", help="file of opening FENs, one per line")
+    parser.add_argument("--random-plies", type=int, default=8, help="random opening length without --openings")
+    parser.add_argument("--seed", type=int, help="seed for the random openings")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="plies before a game is drawn")
+    args = parser.parse_args(args)
+    if len(args.engine) != 2:
+        parser.error("--engine has to be given twice")
+    try:
+        first, second = (EngineConfig.parse(text) for text in args.engine)
+    except ValueError as e:
+        parser.error(str(e))
+    if first.name == second.name:
+        parser.error("the engines need different names")
+
+    if args.openings:
+        openings = read_openings(args.openings)
+    else:
+        rng = random.Random(args.seed)
+        openings = [(START_FEN, random_opening(rng, args.random_plies)) for _ in range((args.games + 1) // 2)]
+    run_match(first, second, args.games, openings, args.output, args.processes, args.max_plies)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
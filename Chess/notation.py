@@ -0,0 +1,108 @@
+"""
+Standard algebraic notation (SAN) for whole move lists. What a position's moves need to be written, the squares each
+kind of piece gives check from, the pieces that uncover a check when they move, and which moves share a destination,
+is worked out once per position from the attack tables, so most moves are written without being made. Only checking
+moves are made, to see if they mate, along with the rare castling and enpassant moves.
+
+    sans = san_moves(gs)  # SAN of gs.get_legal_moves(), in the same order
+"""
+
+from .ChessEngine import FILES, SQUARE_NAMES
+from .tables import KNIGHT_ATTACKS, PAWN_ATTACKS, ROOK_REACH, BISHOP_REACH, BETWEEN, LINE, rook_attacks, \
+    bishop_attacks
+
+RANK_NAMES = "87654321"  # by row
+CASTLE_SAN = {6: "O-O", 2: "O-O-O"}  # by the king's end column
+SLIDER_ATTACKS = {"B": [bishop_attacks], "R": [rook_attacks], "Q": [bishop_attacks, rook_attacks]}
+
+
+class SANWriter:
+    """ writes SAN for the legal moves of one position, moves defaults to gs.get_legal_moves() """
+
+    def __init__(self, gs, moves=None):
+        self.gs = gs
+        self.moves = gs.get_legal_moves() if moves is None else moves
+        color = "w" if gs.white_move else "b"
+        enemy = "b" if gs.white_move else "w"
+        bitboards = gs.bitboards
+        occupied = gs.occupied
+        king_sq = bitboards[enemy + "K"].bit_length() - 1
+        self.king_sq = king_sq
+
+        # squares each kind of piece would give check from, after a move that doesn't uncover a line to the king
+        bishop_checks = bishop_attacks(king_sq, occupied)
+        rook_checks = rook_attacks(king_sq, occupied)
+        self.checks = {"P": PAWN_ATTACKS[enemy][king_sq], "N": KNIGHT_ATTACKS[king_sq], "B": bishop_checks,
+                       "R": rook_checks, "Q": bishop_checks | rook_checks, "K": 0}
+
+        # own pieces standing alone between one of our sliders and the enemy king, a move off that line gives check
+        self.discovered = {}
+        queens = bitboards[color + "Q"]
+        sliders = ((ROOK_REACH[king_sq] & (bitboards[color + "R"] | queens)) |
+                   (BISHOP_REACH[king_sq] & (bitboards[color + "B"] | queens)))
+        while sliders:
+            bit = sliders & -sliders
+            sliders ^= bit
+            ray = BETWEEN[king_sq][bit.bit_length() - 1]
+            blockers = ray & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & gs.occupancy[color]:
+                self.discovered[blockers.bit_length() - 1] = ray | bit
+
+        # start squares of the moves of each piece to each square, for disambiguation
+        self.origins = {}
+        for move in self.moves:
+            self.origins.setdefault((move.piece_moved, move.end), []).append(move.start)
+
+    def san(self, move):
+        """ SAN of move, which has to be one of the moves the writer was made with """
+        start, end = move.start, move.end
+        piece = move.piece_moved[1]
+        capture = "x" if move.piece_captured != "--" else ""
+        if move.is_castle:
+            san = CASTLE_SAN[end & 7]
+        elif piece == "P":
+            san = (FILES[start & 7] if capture else "") + capture + SQUARE_NAMES[end]
+            if move.promotion_choice:
+                san += "=" + move.promotion_choice
+        else:
+            origins = self.origins[(move.piece_moved, end)]
+            prefix = ""
+            if len(origins) > 1:
+                others = [origin for origin in origins if origin != start]
+                if all(origin & 7 != start & 7 for origin in others):
+                    prefix = FILES[start & 7]
+                elif all(origin >> 3 != start >> 3 for origin in others):
+                    prefix = RANK_NAMES[start >> 3]
+                else:
+                    prefix = SQUARE_NAMES[start]
+            san = piece + prefix + capture + SQUARE_NAMES[end]
+        if self.gives_check(move):
+            gs = self.gs
+            gs.make_move(move)
+            mate = not gs.get_legal_moves()
+            gs.undo_move()
+            san += "#" if mate else "+"
+        return san
+
+    def gives_check(self, move):
+        if move.flags:  # castling and enpassant move two pieces, so they're made and checked
+            gs = self.gs
+            gs.make_move(move)
+            check = gs.check("w" if gs.white_move else "b")
+            gs.undo_move()
+            return check
+        start, end = move.start, move.end
+        if start in self.discovered and not (1 << end) & self.discovered[start]:
+            return True
+        kind = move.promotion_choice or move.piece_moved[1]
+        if kind in SLIDER_ATTACKS and LINE[self.king_sq][start]:
+            # the piece leaving start could open the line it moves along, so trace it without the piece there
+            occupied = self.gs.occupied ^ (1 << start)
+            return any(attacks(self.king_sq, occupied) & (1 << end) for attacks in SLIDER_ATTACKS[kind])
+        return bool(self.checks[kind] & (1 << end))
+
+
+def san_moves(gs, moves=None):
+    """ SAN of every move in moves, the legal moves of gs by default, in the same order. gs is left as it was """
+    writer = SANWriter(gs, moves)
+    return [writer.san(move) for move in writer.moves]
@@ -0,0 +1,78 @@
+"""
+Multi-process search (Lazy SMP). Every worker process searches the same position with its own Search, all of them
+reading and writing one transposition table kept in shared memory, so the helpers fill the table with results the main
+search then finds instead of searching them. Odd numbered helpers start a ply deeper so the workers don't all search
+the same tree in step.
+
+    with ParallelSearch(workers=32, tt_size_mb=256) as search:
+        result = search.search(gs, time_ms=5000)
+"""
+
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+from .search import Search, SearchResult, MAX_PLY
+from .transposition import TranspositionTable, size_bytes
+
+# each worker process's Search and the shared memory its transposition table lives in, set up by _init_worker
+_search = None
+_shm = None
+
+
+def _init_worker(shm_name, tt_size_mb, stop_event):
+    global _search, _shm
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    _search = Search(tt=TranspositionTable(tt_size_mb, buffer=_shm.buf), stop_event=stop_event)
+
+
+def _run_search(gs, depth, time_ms, nodes, start_depth):
+    return _search.search(gs, depth=depth, time_ms=time_ms, nodes=nodes, start_depth=start_depth)
+
+
+class ParallelSearch:
+    def __init__(self, workers=None, tt_size_mb=64):
+        self.workers = workers or os.cpu_count() or 1
+        self.tt_size_mb = tt_size_mb
+        context = multiprocessing.get_context()
+        self.stop_event = context.Event()
+        self.shm = shared_memory.SharedMemory(create=True, size=size_bytes(tt_size_mb))
+        self.pool = context.Pool(self.workers, initializer=_init_worker,
+                                 initargs=(self.shm.name, tt_size_mb, self.stop_event))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stop(self):
+        """ ends a running search, it returns the best move found so far """
+        self.stop_event.set()
+
+    def search(self, gs, depth=MAX_PLY, time_ms=None, nodes=None):
+        """
+        searches gs on every worker and returns the main worker's SearchResult, or a helper's if it got deeper, with
+        nodes and nps summed over all workers. nodes limits each worker. gs isn't changed.
+        """
+        start = time.perf_counter()
+        self.stop_event.clear()
+        tasks = [self.pool.apply_async(_run_search, (gs, depth, time_ms, nodes, 1 + i % 2))
+                 for i in range(self.workers)]
+        main = tasks[0].get()
+        self.stop_event.set()  # helpers stop as soon as the main search has its answer
+        results = [main] + [task.get() for task in tasks[1:]]
+        best = main
+        for result in results[1:]:
+            if result.depth > best.depth and result.best_move is not None:
+                best = result
+        elapsed = time.perf_counter() - start
+        total_nodes = sum(result.nodes for result in results)
+        return SearchResult(best.best_move, best.score, best.depth, total_nodes, elapsed, best.pv)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,128 @@
+"""
+Perft (performance test) for the move generator. Counts the leaf nodes of the move tree to a fixed depth and compares
+them to known values, which checks move generation is correct and measures how fast it is.
+
+usage: python -m Chess.perft --depth 4 --output results.json --compare previous.json
+"""
+
+import argparse
+import json
+import platform
+import time
+
+from .ChessEngine import GameState, START_FEN
+
+# standard test positions with known node counts for depths 1, 2, 3...
+POSITIONS = {
+    "start": (START_FEN, [20, 400, 8902, 197281, 4865609, 119060324]),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 [48, 2039, 97862, 4085603, 193690690]),
+    "endgame": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624, 11030083]),
+    "promotions": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333, 15833292]),
+    "talkchess": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487, 89941194]),
+    "middlegame": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                   [46, 2079, 89890, 3894594, 164075551]),
+}
+
+
+def perft(gs, depth):
+    """ number of leaf nodes depth moves from the current position """
+    moves = gs.get_legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        gs.make_move(move, print_move=False)
+        nodes += perft(gs, depth - 1)
+        gs.undo_move()
+    return nodes
+
+
+def divide(gs, depth):
+    """ perft split by root move, {uci move: nodes} """
+    counts = {}
+    for move in gs.get_legal_moves():
+        gs.make_move(move, print_move=False)
+        counts[move.get_uci_notation()] = perft(gs, depth - 1) if depth > 1 else 1
+        gs.undo_move()
+    return counts
+
+
+def run(name, fen, depth, expected=None, split=False):
+    """ runs perft on a position and returns the result as a dict ready to be saved as JSON """
+    gs = GameState(fen)
+    start = time.perf_counter()
+    if split:
+        counts = divide(gs, depth)
+        nodes = sum(counts.values())
+    else:
+        counts = None
+        nodes = perft(gs, depth)
+    elapsed = time.perf_counter() - start
+    result = {"position": name, "fen": fen, "depth": depth, "nodes": nodes, "time": round(elapsed, 4),
+              "nps": int(nodes / elapsed) if elapsed > 0 else 0}
+    if expected is not None:
+        result["expected"] = expected
+        result["passed"] = nodes == expected
+    if counts is not None:
+        result["divide"] = counts
+    return result
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="perft node counts and move generation speed")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--position", action="append", choices=sorted(POSITIONS),
+                        help="test position to run, can be repeated (default: all)")
+    parser.add_argument("--fen", help="run a custom position instead of the test positions")
+    parser.add_argument("--divide", action="store_true", help="print node counts for each root move")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare nodes per second against")
+    args = parser.parse_args(args)
+
+    if args.fen:
+        runs = [("custom", args.fen, None)]
+    else:
+        runs = []
+        for name in args.position or POSITIONS:
+            fen, counts = POSITIONS[name]
+            runs.append((name, fen, counts[args.depth - 1] if args.depth <= len(counts) else None))
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            for result in json.load(f)["results"]:
+                previous[(result["fen"], result["depth"])] = result
+
+    results = []
+    for name, fen, expected in runs:
+        result = run(name, fen, args.depth, expected, args.divide)
+        results.append(result)
+        if "divide" in result:
+            for move, nodes in sorted(result["divide"].items()):
+                print(move + ": " + str(nodes))
+        status = ""
+        if expected is not None:
+            status = "ok" if result["passed"] else "FAILED, expected " + str(expected)
+        line = "{:<12} depth {} nodes {:>12} time {:>9.3f}s nps {:>9} {}".format(
+            name, args.depth, result["nodes"], result["time"], result["nps"], status)
+        old = previous.get((fen, args.depth))
+        if old is not None and old["nps"]:
+            line += " ({:+.1f}% nps)".format(100 * (result["nps"] / old["nps"] - 1))
+        print(line)
+
+    total_nodes = sum(result["nodes"] for result in results)
+    total_time = sum(result["time"] for result in results)
+    print("total nodes {} time {:.3f}s nps {}".format(total_nodes, total_time,
+                                                     int(total_nodes / total_time) if total_time > 0 else 0))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                       "machine": platform.machine(), "results": results}, f, indent=2)
+
+    return 0 if all(result.get("passed", True) for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
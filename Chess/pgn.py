@@ -0,0 +1,263 @@
+"""
+Streaming PGN reading and parallel game replay. Games are read one at a time from plain or gzipped files, so files of
+any size can be processed in constant memory, and replayed through GameState on a process pool.
+
+usage: python -m Chess.pgn games.pgn.gz --processes 8 --unordered
+"""
+
+import argparse
+import collections
+import gzip
+import multiprocessing
+import os
+import queue
+import re
+import time
+
+from .ChessEngine import GameState, START_FEN
+
+HEADER = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+# comments, variations are removed separately since they nest
+COMMENT = re.compile(r"\{[^}]*\}|;[^\n]*")
+MOVE_NUMBER = re.compile(r"^\d+\.+")
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+# tags every exported game starts with, in this order
+SEVEN_TAG_ROSTER = ["Event", "Site", "Date", "Round", "White", "Black", "Result"]
+SAN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$")
+
+
+class PGNGame:
+    def __init__(self, headers, moves, result):
+        self.headers = headers  # {tag: value}
+        self.moves = moves  # SAN strings
+        self.result = result
+
+    def __repr__(self):
+        return "PGNGame({} vs {}, {} moves, {})".format(self.headers.get("White", "?"), self.headers.get("Black", "?"),
+                                                         len(self.moves), self.result)
+
+
+def open_pgn(path):
+    """ opens a PGN file as text, gzipped if it starts with the gzip magic bytes """
+    with open(path, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    if gzipped:
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def read_games(source):
+    """ yields a PGNGame for each game in source, a path or an open text file, reading one line at a time """
+    if isinstance(source, str):
+        with open_pgn(source) as f:
+            yield from read_games(f)
+        return
+    headers = {}
+    movetext = []
+    for line in source:
+        line = line.strip()
+        if line.startswith("%"):  # escaped line
+            continue
+        match = HEADER.match(line)
+        if match:
+            if movetext:  # a header after movetext starts the next game
+                yield parse_game(headers, movetext)
+                headers = {}
+                movetext = []
+            headers[match.group(1)] = match.group(2)
+        elif line:
+            movetext.append(line)
+    if headers or movetext:
+        yield parse_game(headers, movetext)
+
+
+def parse_game(headers, movetext):
+    text = COMMENT.sub(" ", "\n".join(movetext))
+    moves = []
+    result = headers.get("Result", "*")
+    depth = 0
+    for token in text.replace("(", " ( ").replace(")", " ) ").split():
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth > 0 or token.startswith("$"):
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            token = MOVE_NUMBER.sub("", token)
+            if token:
+                moves.append(token)
+    return PGNGame(headers, moves, result)
+
+
+def parse_san(gs, san, moves=None):
+    """ the legal move in gs written as san, raises ValueError if there isn't exactly one """
+    if moves is None:
+        moves = gs.get_legal_moves()
+    san = san.rstrip("+#!?")
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        end_col = 6 if len(san) == 3 else 2
+        found = [move for move in moves if move.is_castle and move.end & 7 == end_col]
+    else:
+        match = SAN.match(san)
+        if match is None:
+            raise ValueError("can't read move " + san)
+        piece, from_file, from_rank, _, square, promotion = match.groups()
+        end = (8 - int(square[1])) * 8 + "abcdefgh".index(square[0])
+        piece = piece or "P"
+        found = [move for move in moves
+                 if move.end == end and move.piece_moved[1] == piece and not move.is_castle
+                 and (from_file is None or move.start & 7 == "abcdefgh".index(from_file))
+                 and (from_rank is None or move.start >> 3 == 8 - int(from_rank))
+                 and move.promotion_choice == promotion]
+    if len(found) != 1:
+        raise ValueError(("ambiguous" if found else "illegal") + " move " + san + " in " + gs.get_fen())
+    return found[0]
+
+
+def write_game(headers, moves, result, fen=None):
+    """
+    a game as PGN text: the seven tag roster first, then any other headers, then the SAN moves wrapped at 80
+    columns. fen is the starting position when the game doesn't start from the usual one
+    """
+    headers = dict(headers, Result=result)
+    if fen is not None and fen != START_FEN:
+        headers.update(SetUp="1", FEN=fen)
+    tags = SEVEN_TAG_ROSTER + [tag for tag in headers if tag not in SEVEN_TAG_ROSTER]
+    lines = ['[{} "{}"]'.format(tag, headers.get(tag, "?").replace("\\", "\\\\").replace('"', '\\"'))
+             for tag in tags]
+    lines.append("")
+    fields = (fen or START_FEN).split()
+    white_move = fields[1] == "w"
+    number = int(fields[5]) if len(fields) > 5 else 1
+    tokens = []
+    for i, san in enumerate(moves):
+        if white_move:
+            tokens.append("{}.".format(number))
+        elif i == 0:
+            tokens.append("{}...".format(number))
+        tokens.append(san)
+        if not white_move:
+            number += 1
+        white_move = not white_move
+    tokens.append(result)
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = line + " " + token if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def replay_game(game, positions=False):
+    """
+    plays a game's moves through GameState, checking each one is legal. returns a dict with the headers, result,
+    number of plies played, final FEN, any error, and the FEN after every move when positions is True.
+    """
+    gs = GameState(game.headers.get("FEN", START_FEN))
+    summary = {"headers": game.headers, "result": game.result, "plies": 0, "error": None}
+    fens = []
+    for san in game.moves:
+        try:
+            move = parse_san(gs, san)
+        except ValueError as e:
+            summary["error"] = str(e)
+            break
+        gs.make_move(move)
+        summary["plies"] += 1
+        if positions:
+            fens.append(gs.get_fen())
+    summary["final_fen"] = gs.get_fen()
+    if positions:
+        summary["positions"] = fens
+    return summary
+
+
+def _replay_chunk(games, positions):
+    return [replay_game(game, positions) for game in games]
+
+
+def _chunks(games, size):
+    chunk = []
+    for game in games:
+        chunk.append(game)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def replay_parallel(games, processes=None, ordered=True, chunk_size=64, max_pending=None, positions=False):
+    """
+    replays games (any iterable of PGNGames, e.g. read_games(path)) on a process pool and yields each game's
+    replay_game summary. games are sent in chunks of chunk_size, and no more than max_pending chunks (default twice
+    the number of processes) are read ahead, so memory stays bounded. ordered=False yields results as soon as
+    they're ready instead of in input order.
+    """
+    processes = processes or os.cpu_count() or 1
+    max_pending = max_pending or 2 * processes
+    with multiprocessing.Pool(processes) as pool:
+        if ordered:
+            pending = collections.deque()
+            for chunk in _chunks(games, chunk_size):
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().get()
+                pending.append(pool.apply_async(_replay_chunk, (chunk, positions)))
+            while pending:
+                yield from pending.popleft().get()
+        else:
+            done = queue.Queue()
+            in_flight = 0
+            for chunk in _chunks(games, chunk_size):
+                if in_flight >= max_pending:
+                    yield from _finished(done.get())
+                    in_flight -= 1
+                pool.apply_async(_replay_chunk, (chunk, positions), callback=done.put, error_callback=done.put)
+                in_flight += 1
+            for _ in range(in_flight):
+                yield from _finished(done.get())
+
+
+def _finished(result):
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="replay PGN games through GameState and report statistics")
+    parser.add_argument("files", nargs="+", help="PGN files, optionally gzipped")
+    parser.add_argument("--processes", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--unordered", action="store_true", help="process results as they finish")
+    parser.add_argument("--chunk-size", type=int, default=64, help="games sent to a worker at a time")
+    args = parser.parse_args(args)
+
+    def all_games():
+        for path in args.files:
+            yield from read_games(path)
+
+    start = time.perf_counter()
+    games = plies = errors = 0
+    results = collections.Counter()
+    for summary in replay_parallel(all_games(), args.processes, not args.unordered, args.chunk_size):
+        games += 1
+        plies += summary["plies"]
+        results[summary["result"]] += 1
+        if summary["error"]:
+            errors += 1
+            print("game {}: {}".format(games, summary["error"]))
+    elapsed = time.perf_counter() - start
+    print("games {} plies {} errors {} time {:.1f}s games/s {:.0f} plies/s {:.0f}".format(
+        games, plies, errors, elapsed, games / elapsed if elapsed else 0, plies / elapsed if elapsed else 0))
+    print("results " + ", ".join("{} {}".format(result, count) for result, count in sorted(results.items())))
+    return 0 if errors == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+"""
+Opt-in instrumentation for finding where engine time goes. Counting wraps the hot GameState, Move and Search methods
+in place while it's on and puts the originals back afterwards, so the engine runs its normal code at full speed the
+rest of the time.
+
+    with counters() as stats:
+        gs.get_valid_moves()
+    print(stats.report())
+
+    with capture("profile.txt"):  # a cProfile run, written out as a pstats report
+        Search().search(gs, depth=4)
+
+usage: python -m Chess.profiling --depth 4 --fen "<fen>" --cprofile profile.txt
+"""
+
+import argparse
+import contextlib
+import cProfile
+import io
+import pstats
+import sys
+import time
+
+from .ChessEngine import GameState, Move, START_FEN
+from .search import Search
+
+# (class, method name, phase it's reported as)
+HOT_PATHS = [
+    (GameState, "get_legal_moves", "legal generation"),
+    (GameState, "get_all_moves", "pseudo-legal generation"),
+    (GameState, "pins_and_checks", "pins and checks"),
+    (GameState, "check", "check"),
+    (GameState, "attacked", "attacked"),
+    (GameState, "make_move", "make_move"),
+    (GameState, "undo_move", "undo_move"),
+    (Move, "__init__", "Move construction"),
+    (Search, "negamax", "negamax"),
+    (Search, "quiescence", "quiescence"),
+]
+
+
+class Stats:
+    def __init__(self):
+        self.calls = {phase: 0 for _, _, phase in HOT_PATHS}
+        self.seconds = {phase: 0.0 for _, _, phase in HOT_PATHS}  # cumulative, includes time in nested phases
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def nodes(self):
+        """ positions visited, counted as moves made """
+        return self.calls["make_move"]
+
+    @property
+    def nps(self):
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    def report(self):
+        """ a table of calls and time per phase, slowest first """
+        lines = ["{:<24} {:>10} {:>10} {:>9} {:>7}".format("phase", "calls", "total ms", "us/call", "% time")]
+        for phase in sorted(self.calls, key=self.seconds.get, reverse=True):
+            calls = self.calls[phase]
+            if not calls:
+                continue
+            seconds = self.seconds[phase]
+            share = 100 * seconds / self.elapsed if self.elapsed else 0
+            lines.append("{:<24} {:>10} {:>10.1f} {:>9.2f} {:>7.1f}".format(
+                phase, calls, seconds * 1000, seconds / calls * 1e6, share))
+        lines.append("elapsed {:.3f}s nodes {} nps {}".format(self.elapsed, self.nodes, self.nps))
+        return "\n".join(lines)
+
+
+def _timed(function, phase, stats):
+    calls = stats.calls
+    seconds = stats.seconds
+    clock = time.perf_counter
+    active = [0]  # calls of this phase in progress, only the outermost of recursive calls is timed
+
+    def timed(*args, **kwargs):
+        calls[phase] += 1
+        if active[0]:
+            return function(*args, **kwargs)
+        active[0] = 1
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds[phase] += clock() - start
+            active[0] = 0
+    return timed
+
+
+@contextlib.contextmanager
+def counters():
+    """
+    counts calls to and time spent in each of the HOT_PATHS while the block runs, yields the Stats being filled in.
+    GameStates created before the block still count, the methods are swapped on the classes.
+    """
+    stats = Stats()
+    originals = [(cls, name, cls.__dict__[name]) for cls, name, _ in HOT_PATHS]
+    for cls, name, phase in HOT_PATHS:
+        setattr(cls, name, _timed(cls.__dict__[name], phase, stats))
+    try:
+        yield stats
+    finally:
+        for cls, name, function in originals:
+            setattr(cls, name, function)
+        stats.elapsed = time.perf_counter() - stats.start
+
+
+@contextlib.contextmanager
+def capture(path=None, sort="cumulative", limit=40):
+    """ runs the block under cProfile and writes the top limit functions by sort to path, or stdout if path is None """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats(sort).print_stats(limit)
+        if path is None:
+            sys.stdout.write(report.getvalue())
+        else:
+            with open(path, "w") as f:
+                f.write(report.getvalue())
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="search a position with hot-path counters and report the time split")
+    parser.add_argument("--fen", default=START_FEN)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--cprofile", metavar="PATH", help="also write a cProfile report to PATH")
+    args = parser.parse_args(args)
+
+    gs = GameState(args.fen)
+    with counters() as stats:
+        result = Search().search(gs, depth=args.depth)
+    print(result)
+    print(stats.report())
+    if args.cprofile:
+        with capture(args.cprofile):
+            Search().search(gs, depth=args.depth)
+        print("cProfile report written to " + args.cprofile)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,266 @@
+"""
+Chooses moves: iterative deepening negamax with alpha-beta pruning, a transposition table, MVV-LVA, killer and history
+move ordering, and a quiescence search over captures. Searches stop on a node or time budget and return the best move
+of the deepest completed iteration.
+"""
+
+import time
+
+from .evaluation import evaluate
+from .transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+MATE = 100000  # score for giving mate now, mate in n plies scores MATE - n
+INFINITY = MATE + 1
+MAX_PLY = 64
+CHECK_INTERVAL = 1024
+FORCED_MOVE_DEPTH = 4  # a single legal move is only searched deep enough to score it
+
+PIECE_VALUES = {"P": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 0}  # for ordering captures
+
+
+class SearchAborted(Exception):
+    """ raised inside the search when the node or time budget runs out, or stop() is called """
+
+
+class SearchResult:
+    def __init__(self, best_move, score, depth, nodes, elapsed, pv):
+        self.best_move = best_move
+        self.score = score  # centipawns from the point of view of the side to move
+        self.depth = depth  # deepest completed iteration
+        self.nodes = nodes
+        self.time = elapsed  # seconds
+        self.nps = int(nodes / elapsed) if elapsed > 0 else 0
+        self.pv = pv  # principal variation, best_move first
+
+    def __repr__(self):
+        return "SearchResult(best_move={}, score={}, depth={}, nodes={}, nps={}, pv={})".format(
+            self.best_move, self.score, self.depth, self.nodes, self.nps,
+            " ".join(move.get_uci_notation() for move in self.pv))
+
+
+class Search:
+    def __init__(self, tt_size_mb=16, tt=None, stop_event=None):
+        """ tt replaces the search's own transposition table, stop_event is an Event that ends searches when set """
+        self.tt = tt if tt is not None else TranspositionTable(tt_size_mb)
+        self.nodes = 0
+        self.stop_requested = False
+        self.stop_event = stop_event
+        self.node_limit = None
+        self.deadline = None
+        self.next_check = 0  # node count the limits are checked at next
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = {}
+        self.pv = [[] for _ in range(MAX_PLY + 1)]
+        self.root_move = 0  # move_ID of the previous iteration's best move, searched first at the root
+
+    def stop(self):
+        """ ends a running search, it returns the best move found so far. safe to call from another thread """
+        self.stop_requested = True
+
+    def search(self, gs, depth=MAX_PLY, time_ms=None, nodes=None, info=None, start_depth=1):
+        """
+        searches the position to the given depth, or until time_ms milliseconds or nodes nodes are used up.
+        info is called with a SearchResult after every completed iteration. start_depth skips the shallower
+        iterations, for helper searches that should get ahead of the main one. gs is left as it was.
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        self.stop_requested = False
+        self.node_limit = nodes
+        self.next_check = 0
+        self.deadline = start + time_ms / 1000 if time_ms is not None else None
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = {}
+        self.tt.new_search()
+        log_length = len(gs.move_log)
+
+        root_moves = gs.get_legal_moves()
+        result = SearchResult(root_moves[0] if root_moves else None, 0, 0, 0, 0, root_moves[:1])
+        if not root_moves:
+            result.score = -MATE if gs.check("w" if gs.white_move else "b") else 0
+            return result
+        if len(root_moves) == 1:
+            depth = min(depth, FORCED_MOVE_DEPTH)
+        for iteration in range(min(start_depth, depth), min(depth, MAX_PLY) + 1):
+            # ordered first at the root whatever the table holds, the aborted iteration handling below relies on it
+            self.root_move = result.best_move.move_ID if result.depth else 0
+            try:
+                score = self.negamax(gs, iteration, -INFINITY, INFINITY, 0)
+            except SearchAborted:
+                while len(gs.move_log) > log_length:
+                    gs.undo_move()
+                # the previous best is searched first, so a root move that beat it in the unfinished iteration is better
+                if self.pv[0]:
+                    result.best_move = self.pv[0][0]
+                    result.pv = list(self.pv[0])
+                break
+            elapsed = time.perf_counter() - start
+            result = SearchResult(self.pv[0][0], score, iteration, self.nodes, elapsed, list(self.pv[0]))
+            if info is not None:
+                info(result)
+            if abs(score) >= MATE - MAX_PLY:
+                break
+            # an iteration takes several times longer than the last one, don't start one that can't finish
+            if self.deadline is not None and time.perf_counter() > start + (self.deadline - start) / 2:
+                break
+        result.nodes = self.nodes
+        result.time = time.perf_counter() - start
+        result.nps = int(result.nodes / result.time) if result.time > 0 else 0
+        return result
+
+    def check_limits(self):
+        """ raises SearchAborted if the search has to stop, limits are checked every CHECK_INTERVAL nodes """
+        self.next_check = self.nodes + CHECK_INTERVAL
+        if self.node_limit is not None:
+            self.next_check = min(self.next_check, self.node_limit)
+        if self.stop_requested or (self.stop_event is not None and self.stop_event.is_set()):
+            raise SearchAborted
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted
+
+    def negamax(self, gs, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.check_limits()
+        self.pv[ply] = []
+        if ply > 0 and gs.repetition_count():
+            return 0
+
+        turn = "w" if gs.white_move else "b"
+        in_check = gs.check(turn)
+        if in_check and ply < MAX_PLY - 1:
+            depth += 1  # check extension
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self.quiescence(gs, alpha, beta, ply)
+
+        tt_move = 0
+        entry = self.tt.probe(gs.zobrist_key)
+        if entry is not None:
+            tt_depth, tt_score, flag, tt_move = entry
+            if ply > 0 and tt_depth >= depth:
+                tt_score = score_from_tt(tt_score, ply)
+                if flag == EXACT or (flag == LOWER and tt_score >= beta) or (flag == UPPER and tt_score <= alpha):
+                    return tt_score
+        if ply == 0 and self.root_move:
+            tt_move = self.root_move
+
+        moves = gs.get_legal_moves()
+        if not moves:
+            return -MATE + ply if in_check else 0
+        self.order_moves(moves, tt_move, ply)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = moves[0]
+        for move in moves:
+            gs.make_move(move, print_move=False)
+            score = -self.negamax(gs, depth - 1, -beta, -alpha, ply + 1)
+            gs.undo_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self.pv[ply] = [move] + self.pv[ply + 1]
+                    if score >= beta:
+                        if move.piece_captured == "--" and not move.promotion_choice:
+                            self.update_quiet_history(move, depth, ply)
+                        break
+
+        if best_score >= beta:
+            flag = LOWER
+        elif best_score > original_alpha:
+            flag = EXACT
+        else:
+            flag = UPPER
+        self.tt.store(gs.zobrist_key, depth, score_to_tt(best_score, ply), flag, best_move.move_ID)
+        return best_score
+
+    def quiescence(self, gs, alpha, beta, ply):
+        """ searches captures and promotions until the position is quiet, so leaves aren't evaluated mid exchange """
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.check_limits()
+        self.pv[ply] = []
+        if ply >= MAX_PLY - 1:  # checking sequences could otherwise run past the end of pv
+            return evaluate(gs)
+
+        if gs.check("w" if gs.white_move else "b"):
+            moves = gs.get_legal_moves()
+            if not moves:
+                return -MATE + ply
+            best_score = -INFINITY  # no standing pat in check, every evasion is searched
+        else:
+            best_score = evaluate(gs)
+            if best_score >= beta:
+                return best_score
+            alpha = max(alpha, best_score)
+            moves = [move for move in gs.get_legal_moves() if move.piece_captured != "--" or move.promotion_choice]
+        self.order_moves(moves, 0, None)
+
+        for move in moves:
+            gs.make_move(move, print_move=False)
+            score = -self.quiescence(gs, -beta, -alpha, ply + 1)
+            gs.undo_move()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    self.pv[ply] = [move] + self.pv[ply + 1]
+                    if score >= beta:
+                        break
+        return best_score
+
+    def order_moves(self, moves, tt_move, ply):
+        """
+        sorts moves best first: the transposition table move, captures and promotions by MVV-LVA, the killer moves
+        for this ply, then quiet moves by history score
+        """
+        killers = self.killers[ply] if ply is not None else (0, 0)
+        history = self.history
+
+        def key(move):
+            move_ID = move.move_ID
+            if move_ID == tt_move:
+                return 10000000
+            if move.piece_captured != "--" or move.promotion_choice:
+                score = 10 * PIECE_VALUES[move.piece_captured[1]] if move.piece_captured != "--" else 0
+                if move.promotion_choice:
+                    score += PIECE_VALUES[move.promotion_choice]
+                return 1000000 + score - PIECE_VALUES[move.piece_moved[1]] // 10
+            if move_ID == killers[0]:
+                return 900000
+            if move_ID == killers[1]:
+                return 800000
+            return history.get((move.piece_moved, move.end), 0)
+
+        moves.sort(key=key, reverse=True)
+
+    def update_quiet_history(self, move, depth, ply):
+        """ a quiet move caused a beta cutoff, remember it as a killer for this ply and raise its history score """
+        killers = self.killers[ply]
+        move_ID = move.move_ID
+        if killers[0] != move_ID:
+            killers[1] = killers[0]
+            killers[0] = move_ID
+        key = (move.piece_moved, move.end)
+        self.history[key] = min(self.history.get(key, 0) + depth * depth, 700000)
+
+
+def score_to_tt(score, ply):
+    """ mate scores are stored relative to the node, not the root, so they stay right when reached from elsewhere """
+    if score >= MATE - MAX_PLY:
+        return score + ply
+    if score <= -MATE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE - MAX_PLY:
+        return score - ply
+    if score <= -MATE + MAX_PLY:
+        return score + ply
+    return score
@@ -0,0 +1,332 @@
+"""
+Local analysis server. Clients connect over TCP or a Unix socket and send one JSON object per line, a position and
+search limits, and get one JSON line back per request with the best move, score and principal variation. Searches run
+on a pool of worker processes started once with the server, each keeping its Search and transposition table warm
+from one request to the next.
+
+    -> {"id": 1, "fen": "<fen>", "moves": ["e2e4"], "nodes": 20000}
+    <- {"id": 1, "bestmove": "e7e5", "score": -20, "depth": 5, "nodes": 20000, "nps": 21000, "time_ms": 950,
+        "pv": ["e7e5", "g1f3"]}
+    -> {"id": 2, "cancel": true}  # drops request 2 if it's queued, stops its search if it's running
+
+A request whose id matches one of the connection's unanswered requests is rejected.
+
+Requests wait in a bounded queue. When it's full the server stops reading from clients until a worker frees up, so a
+burst slows clients down instead of growing memory.
+
+usage: python -m Chess.server --port 8765 --workers 8
+       python -m Chess.server --bench-clients 16 --bench-requests 50
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import time
+
+from .ChessEngine import GameState, START_FEN
+from .search import Search, MAX_PLY
+
+DEFAULT_TIME_MS = 1000  # for requests that don't give a depth, time or node limit
+MAX_LINE = 1 << 16
+
+
+def _worker(conn, stop_event, tt_size_mb):
+    """ a worker process, searches the positions sent on conn until it receives None """
+    search = Search(tt_size_mb=tt_size_mb, stop_event=stop_event)
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        fen, moves, depth, time_ms, nodes = task
+        try:
+            gs = GameState(fen)
+            for uci in moves:
+                legal = [move for move in gs.get_legal_moves() if move.get_uci_notation() == uci]
+                if not legal:
+                    raise ValueError("illegal move " + uci)
+                gs.make_move(legal[0])
+            result = search.search(gs, depth=depth, time_ms=time_ms, nodes=nodes)
+        except Exception as e:  # a bad request mustn't take the worker down
+            conn.send({"error": "{}: {}".format(type(e).__name__, e)})
+            continue
+        conn.send({"bestmove": result.best_move.get_uci_notation() if result.best_move is not None else None,
+                   "score": result.score, "depth": result.depth, "nodes": result.nodes, "nps": result.nps,
+                   "time_ms": int(result.time * 1000), "pv": [move.get_uci_notation() for move in result.pv]})
+
+
+def check_fen(fen):
+    """ raises ValueError if fen isn't a position the workers can search """
+    fields = fen.split()
+    if not 4 <= len(fields) <= 6:
+        raise ValueError("fen needs placement, side to move, castling and enpassant fields and optional counters")
+    rows = fields[0].split("/")
+    if len(rows) != 8:
+        raise ValueError("fen placement needs 8 rows")
+    for row in rows:
+        squares = 0
+        for char in row:
+            if char in "12345678":
+                squares += int(char)
+            elif char in "PNBRQKpnbrqk":
+                squares += 1
+            else:
+                raise ValueError("invalid piece in fen: " + char)
+        if squares != 8:
+            raise ValueError("fen row doesn't have 8 squares: " + row)
+    if fields[0].count("K") != 1 or fields[0].count("k") != 1:
+        raise ValueError("fen needs one king of each color")
+    if fields[1] not in ("w", "b"):
+        raise ValueError("fen side to move has to be w or b")
+    if fields[2] != "-" and any(char not in "KQkq" for char in fields[2]):
+        raise ValueError("invalid fen castling rights: " + fields[2])
+    if fields[3] != "-" and (len(fields[3]) != 2 or fields[3][0] not in "abcdefgh" or fields[3][1] not in "36"):
+        raise ValueError("invalid fen enpassant square: " + fields[3])
+    if not all(field.isdigit() for field in fields[4:]):
+        raise ValueError("fen move counters have to be numbers")
+    gs = GameState(fen)
+    if gs.check("b" if gs.white_move else "w"):
+        raise ValueError("fen has the side not to move in check")
+
+
+class Worker:
+    """ a worker process and the pipe and stop event the server drives it with """
+
+    def __init__(self, tt_size_mb):
+        self.tt_size_mb = tt_size_mb
+        self.start()
+
+    def start(self):
+        self.conn, child = multiprocessing.Pipe()
+        self.stop_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=_worker, args=(child, self.stop_event, self.tt_size_mb),
+                                               daemon=True)
+        self.process.start()
+        child.close()
+
+    def close(self):
+        self.stop_event.set()
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class Job:
+    def __init__(self, request_id, task, writer, pending):
+        self.id = request_id
+        self.task = task  # (fen, moves, depth, time_ms, nodes) as sent to a worker
+        self.writer = writer
+        self.pending = pending  # the connection's unanswered jobs by id
+        self.cancelled = False
+        self.worker = None  # set while a worker searches it
+
+
+class AnalysisServer:
+    def __init__(self, workers=None, tt_size_mb=16, queue_size=None):
+        self.workers = [Worker(tt_size_mb) for _ in range(workers or os.cpu_count() or 1)]
+        # waits on the workers' pipes, one thread each so a long search doesn't hold up the others
+        self.executor = concurrent.futures.ThreadPoolExecutor(len(self.workers))
+        self.queue_size = queue_size or 4 * len(self.workers)
+        self.queue = None
+        self.server = None
+        self.tasks = []
+        self.clients = {}  # writer of every open connection: the task handling it
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        """ starts listening on a Unix socket at path, or on host and port. returns the asyncio server """
+        self.queue = asyncio.Queue(self.queue_size)
+        self.tasks = [asyncio.ensure_future(self.run_worker(worker)) for worker in self.workers]
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_client, path, limit=MAX_LINE)
+        else:
+            self.server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        # clients may be waiting on a full queue, so their handlers are cancelled rather than waited for
+        tasks = list(self.clients.values()) + self.tasks
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        for worker in self.workers:
+            worker.close()
+        self.executor.shutdown(wait=False)
+
+    async def handle_client(self, reader, writer):
+        pending = {}
+        self.clients[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):  # ValueError for a line over MAX_LINE
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request has to be a JSON object")
+                except ValueError as e:
+                    await self.reply(writer, {"id": None, "error": str(e)})
+                    continue
+                request_id = request.get("id")
+                if isinstance(request_id, (list, dict)):
+                    await self.reply(writer, {"id": None, "error": "id has to be a string, number or null"})
+                    continue
+                if request.get("cancel"):
+                    self.cancel(pending.get(request_id))
+                    continue
+                try:
+                    task = self.parse_task(request)
+                except (TypeError, ValueError) as e:
+                    await self.reply(writer, {"id": request_id, "error": str(e)})
+                    continue
+                if request_id in pending:
+                    # cancel and cleanup find jobs by id, so ids can't be shared by requests still in flight
+                    await self.reply(writer, {"id": request_id, "error": "a request with this id is already pending"})
+                    continue
+                job = Job(request_id, task, writer, pending)
+                pending[request_id] = job
+                await self.queue.put(job)  # waits while the queue is full, so this client isn't read from
+        except asyncio.CancelledError:  # the server is closing
+            pass
+        finally:
+            for job in list(pending.values()):
+                self.cancel(job, reply=False)
+            del self.clients[writer]
+            writer.close()
+
+    @staticmethod
+    def parse_task(request):
+        moves = request.get("moves", [])
+        if not isinstance(moves, list):
+            raise ValueError("moves has to be a list of uci moves")
+        limits = [request.get(name) for name in ("depth", "time_ms", "nodes")]
+        # JSON true and false are ints to Python
+        if any(limit is not None and (type(limit) is not int or limit <= 0) for limit in limits):
+            raise ValueError("depth, time_ms and nodes have to be positive integers")
+        depth, time_ms, nodes = limits
+        if depth is None and time_ms is None and nodes is None:
+            time_ms = DEFAULT_TIME_MS
+        depth = min(depth or MAX_PLY, MAX_PLY)
+        fen = request.get("fen", START_FEN)
+        if not isinstance(fen, str):
+            raise ValueError("fen has to be a string")
+        check_fen(fen)
+        return fen, [str(move) for move in moves], depth, time_ms, nodes
+
+    def cancel(self, job, reply=True):
+        """ drops a queued job, or stops its search if a worker has it. a running job still answers with its move """
+        if job is None or job.cancelled:
+            return
+        job.cancelled = True
+        if job.worker is not None:
+            job.worker.stop_event.set()
+        else:
+            job.pending.pop(job.id, None)
+            if reply:
+                asyncio.ensure_future(self.reply(job.writer, {"id": job.id, "error": "cancelled"}))
+
+    async def run_worker(self, worker):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            if job.cancelled:
+                continue
+            worker.stop_event.clear()
+            job.worker = worker
+            try:
+                worker.conn.send(job.task)
+                result = await loop.run_in_executor(self.executor, worker.conn.recv)
+            except (EOFError, OSError):  # the worker died, answer the job and start a new one
+                worker.conn.close()
+                worker.start()
+                result = {"error": "worker failed"}
+            job.worker = None
+            job.pending.pop(job.id, None)
+            if job.cancelled:
+                result["cancelled"] = True
+            await self.reply(job.writer, dict(result, id=job.id))
+
+    @staticmethod
+    async def reply(writer, message):
+        if writer.is_closing():
+            return
+        writer.write(json.dumps(message).encode() + b"\n")
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def serve(args):
+    server = AnalysisServer(args.workers, args.tt_size_mb, args.queue_size)
+    listener = await server.start(args.host, args.port, args.unix)
+    print("listening on " + (args.unix or "{}:{}".format(args.host, args.port)) + " with {} workers".format(
+        len(server.workers)))
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+async def bench(args):
+    """ starts a server on a free local port and measures requests per second from concurrent clients """
+    server = AnalysisServer(args.workers, args.tt_size_mb, args.queue_size)
+    listener = await server.start("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    request = {"fen": args.bench_fen, "nodes": args.bench_nodes}
+
+    async def client(number):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=MAX_LINE)
+        for i in range(args.bench_requests):
+            writer.write(json.dumps(dict(request, id=i)).encode() + b"\n")
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            if "error" in reply:
+                raise RuntimeError("client {}: {}".format(number, reply["error"]))
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(args.bench_clients)))
+    elapsed = time.perf_counter() - start
+    total = args.bench_clients * args.bench_requests
+    print("{} requests from {} clients on {} workers in {:.2f}s, {:.1f} requests/s".format(
+        total, args.bench_clients, len(server.workers), elapsed, total / elapsed))
+    await server.close()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="serve engine analysis as JSON lines over a local socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, help="search processes (default: one per CPU)")
+    parser.add_argument("--tt-size-mb", type=int, default=16, help="transposition table size of each worker")
+    parser.add_argument("--queue-size", type=int, help="requests waiting for a worker (default: 4 per worker)")
+    parser.add_argument("--bench-clients", type=int, help="run a local benchmark with this many clients instead")
+    parser.add_argument("--bench-requests", type=int, default=20, help="requests per benchmark client")
+    parser.add_argument("--bench-nodes", type=int, default=2000, help="node limit of each benchmark request")
+    parser.add_argument("--bench-fen", default=START_FEN)
+    args = parser.parse_args(args)
+    try:
+        asyncio.run(bench(args) if args.bench_clients else serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
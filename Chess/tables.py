@@ -0,0 +1,100 @@
+"""
+Attack tables computed once at import. Square index = row * 8 + col (a8 is square 0, h1 is square 63), the same
+layout as GameState's bitboards, so move generation and check detection look attacks up instead of shifting masks.
+"""
+
+# (row step, col step) of each ray, positive rays run towards higher square numbers
+ROOK_POSITIVE = [(1, 0), (0, 1)]
+ROOK_NEGATIVE = [(-1, 0), (0, -1)]
+BISHOP_POSITIVE = [(1, 1), (1, -1)]
+BISHOP_NEGATIVE = [(-1, -1), (-1, 1)]
+KNIGHT_STEPS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_STEPS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+def _on_board(r, c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+
+def _steps(steps):
+    """ bitboard of the squares one step away from each square """
+    table = []
+    for sq in range(64):
+        r, c = sq >> 3, sq & 7
+        table.append(sum(1 << (r + dr) * 8 + c + dc for dr, dc in steps if _on_board(r + dr, c + dc)))
+    return table
+
+
+def _ray(sq, dr, dc):
+    """ squares from sq (not included) to the edge of the board in one direction, nearest first """
+    squares = []
+    r, c = (sq >> 3) + dr, (sq & 7) + dc
+    while _on_board(r, c):
+        squares.append(r * 8 + c)
+        r, c = r + dr, c + dc
+    return squares
+
+
+KNIGHT_ATTACKS = _steps(KNIGHT_STEPS)
+KING_ATTACKS = _steps(KING_STEPS)
+# squares a pawn of each color on a square attacks, white pawns move towards row 0
+PAWN_ATTACKS = {"w": _steps([(-1, -1), (-1, 1)]), "b": _steps([(1, -1), (1, 1)])}
+
+# RAYS[(dr, dc)][sq] lists the squares out to the edge, RAY_MASKS holds the same squares as bitboards
+RAYS = {direction: [_ray(sq, *direction) for sq in range(64)]
+        for direction in ROOK_POSITIVE + ROOK_NEGATIVE + BISHOP_POSITIVE + BISHOP_NEGATIVE}
+RAY_MASKS = {direction: [sum(1 << square for square in squares) for squares in rays]
+             for direction, rays in RAYS.items()}
+_ROOK_POSITIVE_MASKS = [RAY_MASKS[direction] for direction in ROOK_POSITIVE]
+_ROOK_NEGATIVE_MASKS = [RAY_MASKS[direction] for direction in ROOK_NEGATIVE]
+_BISHOP_POSITIVE_MASKS = [RAY_MASKS[direction] for direction in BISHOP_POSITIVE]
+_BISHOP_NEGATIVE_MASKS = [RAY_MASKS[direction] for direction in BISHOP_NEGATIVE]
+
+# squares a rook or bishop reaches from each square on an empty board
+ROOK_REACH = [sum(RAY_MASKS[direction][sq] for direction in ROOK_POSITIVE + ROOK_NEGATIVE) for sq in range(64)]
+BISHOP_REACH = [sum(RAY_MASKS[direction][sq] for direction in BISHOP_POSITIVE + BISHOP_NEGATIVE) for sq in range(64)]
+
+# BETWEEN[a][b] is the squares strictly between two squares on a shared row, column or diagonal, LINE[a][b] the whole
+# line through both of them (edge to edge). both are 0 for squares that don't share a line
+BETWEEN = [[0] * 64 for _ in range(64)]
+LINE = [[0] * 64 for _ in range(64)]
+for _direction, _rays in RAYS.items():
+    _opposite = RAY_MASKS[(-_direction[0], -_direction[1])]
+    for _a in range(64):
+        _between = 0
+        for _b in _rays[_a]:
+            BETWEEN[_a][_b] = _between
+            LINE[_a][_b] = RAY_MASKS[_direction][_a] | _opposite[_a] | 1 << _a
+            _between |= 1 << _b
+del _direction, _rays, _opposite, _a, _b, _between
+
+
+def _slide(sq, occupied, positive, negative):
+    """ squares attacked along the rays from sq, each ray stopping at the first occupied square """
+    attacks = 0
+    for rays in positive:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:  # the nearest blocker on a positive ray is its lowest bit
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in negative:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:  # and on a negative ray its highest bit
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return _slide(sq, occupied, _ROOK_POSITIVE_MASKS, _ROOK_NEGATIVE_MASKS)
+
+
+def bishop_attacks(sq, occupied):
+    return _slide(sq, occupied, _BISHOP_POSITIVE_MASKS, _BISHOP_NEGATIVE_MASKS)
+
+
+def queen_attacks(sq, occupied):
+    return (_slide(sq, occupied, _ROOK_POSITIVE_MASKS, _ROOK_NEGATIVE_MASKS) |
+            _slide(sq, occupied, _BISHOP_POSITIVE_MASKS, _BISHOP_NEGATIVE_MASKS))
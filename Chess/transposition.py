@@ -0,0 +1,115 @@
+"""
+Fixed size tables keyed by GameState.zobrist_key: a transposition table for search results and a cache of legal move
+lists.
+"""
+
+EXACT, LOWER, UPPER = 0, 1, 2  # score is exact, a lower bound (fail high) or an upper bound (fail low)
+
+ENTRY_BYTES = 16  # one 64-bit word for the key and one for the packed data
+SCORE_OFFSET = 1 << 31
+CLEAR_CHUNK = 1 << 20  # bytes zeroed at a time by TranspositionTable.clear
+
+
+class TranspositionTable:
+    """
+    search results by zobrist key, stored in a flat buffer of 64-bit words so its memory use is fixed.
+    the table is split into buckets of two entries: the first keeps the deepest result (replaced by deeper or equal
+    depth searches, or results from an older search), the second is always replaced.
+    each entry's key word holds key ^ data, so an entry half written by another process sharing the buffer doesn't
+    match its key and is ignored.
+    """
+
+    def __init__(self, size_mb=16, buffer=None):
+        """ buffer is an optional writable buffer of at least size_bytes(size_mb) zeroed bytes to keep the table in """
+        self.buckets = bucket_count(size_mb)
+        if buffer is None:
+            buffer = bytearray(self.buckets * 2 * ENTRY_BYTES)
+        self.table = memoryview(buffer)[:self.buckets * 2 * ENTRY_BYTES].cast("Q")
+        self.generation = 0
+
+    def new_search(self):
+        """ ages the current entries, so they are replaced before results from the new search """
+        self.generation = (self.generation + 1) & 63
+
+    def clear(self):
+        """ empties the table in place, a chunk at a time so it needs no second table sized buffer """
+        table = self.table.cast("B")
+        zeros = memoryview(bytes(CLEAR_CHUNK))
+        for start in range(0, len(table), CLEAR_CHUNK):
+            end = min(start + CLEAR_CHUNK, len(table))
+            table[start:end] = zeros[:end - start]
+        self.generation = 0
+
+    def probe(self, key):
+        """ (depth, score, flag, move_ID) stored for key, or None """
+        table = self.table
+        index = (key % self.buckets) * 4
+        data = table[index + 1]
+        if table[index] ^ data != key:
+            data = table[index + 3]
+            if table[index + 2] ^ data != key:
+                return None
+        return (data >> 16) & 255, (data >> 32) - SCORE_OFFSET, (data >> 24) & 3, data & 0xFFFF
+
+    def store(self, key, depth, score, flag, move_ID=0):
+        table = self.table
+        index = (key % self.buckets) * 4
+        data = move_ID | min(depth, 255) << 16 | flag << 24 | self.generation << 26 | (score + SCORE_OFFSET) << 32
+        old = table[index + 1]
+        old_key = table[index] ^ old
+        if old_key == key or not old or (old >> 16) & 255 <= depth or (old >> 26) & 63 != self.generation:
+            if old_key != key and old:  # the replaced entry gets a second chance in the other slot
+                table[index + 2] = table[index]
+                table[index + 3] = old
+            table[index] = key ^ data
+            table[index + 1] = data
+        else:
+            table[index + 2] = key ^ data
+            table[index + 3] = data
+
+    def hashfull(self):
+        """ permille of the first 1000 entries used by the current search """
+        table = self.table
+        sample = min(self.buckets, 500)
+        used = 0
+        for i in range(1, sample * 4, 2):
+            if table[i] and (table[i] >> 26) & 63 == self.generation:
+                used += 1
+        return used * 1000 // (sample * 2)
+
+
+def bucket_count(size_mb):
+    return max(1, size_mb * 1024 * 1024 // (2 * ENTRY_BYTES))
+
+
+def size_bytes(size_mb):
+    """ bytes used by a transposition table of size_mb megabytes """
+    return bucket_count(size_mb) * 2 * ENTRY_BYTES
+
+
+class MoveCache:
+    """
+    legal move lists by zobrist key, for GameState.move_cache. direct mapped, a new position always replaces the one
+    in its slot, so the cache never holds more than size lists.
+    """
+
+    def __init__(self, size=65536):
+        self.size = size
+        self.keys = [None] * size
+        self.moves = [None] * size
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ copy of the cached move list for key, or None """
+        index = key % self.size
+        if self.keys[index] == key:
+            self.hits += 1
+            return list(self.moves[index])
+        self.misses += 1
+        return None
+
+    def store(self, key, moves):
+        index = key % self.size
+        self.keys[index] = key
+        self.moves[index] = list(moves)
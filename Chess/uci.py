@@ -0,0 +1,207 @@
+"""
+UCI engine over stdin/stdout, for tournament managers and headless servers. Searches run on a background thread so
+stop is answered at once. Only the engine modules are imported at startup, never pygame or NumPy, and the search with
+its transposition table is created on the first isready or go.
+
+usage: python -m Chess.uci
+"""
+
+import sys
+import threading
+
+from .ChessEngine import GameState, START_FEN
+from .search import Search, MATE, MAX_PLY
+
+NAME = "Chess_Engine"
+AUTHOR = "Suvansh M"
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 4096
+MOVE_OVERHEAD_MS = 30  # kept back from every clock based budget for the time it takes to send the move
+
+
+class UCIEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.gs = GameState()
+        self.hash_mb = DEFAULT_HASH_MB
+        self.book_path = None
+        self.book = None
+        self.search = None
+        self.thread = None
+        self.stopped = threading.Event()  # set by stop or quit, an infinite search waits for it before bestmove
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def searcher(self):
+        """ the Search, created on first use so startup doesn't pay for allocating the transposition table """
+        if self.search is None:
+            try:
+                self.search = Search(tt_size_mb=self.hash_mb)
+            except MemoryError:
+                self.send("info string not enough memory for Hash {} MB, using {} MB".format(
+                    self.hash_mb, DEFAULT_HASH_MB))
+                self.hash_mb = DEFAULT_HASH_MB
+                self.search = Search(tt_size_mb=self.hash_mb)
+        return self.search
+
+    def handle(self, line):
+        """ runs one command, returns False when the engine should exit """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send("id name " + NAME)
+            self.send("id author " + AUTHOR)
+            self.send("option name Hash type spin default {} min 1 max {}".format(DEFAULT_HASH_MB, MAX_HASH_MB))
+            self.send("option name BookFile type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.searcher()
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.wait()
+            if self.search is not None:
+                self.search.tt.clear()
+        elif command == "position":
+            self.wait()
+            self.set_position(args)
+        elif command == "go":
+            self.wait()
+            self.go(args)
+        elif command == "stop":
+            self.wait()
+        elif command == "quit":
+            self.wait()
+            return False
+        elif command == "d":  # not UCI, prints the current position
+            self.send(self.gs.get_fen())
+        return True
+
+    def set_option(self, args):
+        if "name" not in args:
+            return
+        value_at = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:value_at]).lower()
+        value = " ".join(args[value_at + 1:])
+        if name == "hash":
+            try:
+                hash_mb = int(value)
+            except ValueError:
+                self.send("info string invalid Hash value " + value)
+                return
+            self.wait()
+            self.hash_mb = min(MAX_HASH_MB, max(1, hash_mb))
+            self.search = None
+        elif name == "bookfile":
+            if self.book is not None:
+                self.book.close()
+            self.book = None
+            self.book_path = value if value and value != "<empty>" else None
+
+    def set_position(self, args):
+        """ position [startpos | fen <fen>] [moves <move> ...] """
+        moves_at = args.index("moves") if "moves" in args else len(args)
+        fen = START_FEN if not args or args[0] == "startpos" else " ".join(args[1:moves_at])
+        gs = GameState(fen)
+        for uci in args[moves_at + 1:]:
+            for move in gs.get_legal_moves():
+                if move.get_uci_notation() == uci:
+                    gs.make_move(move)
+                    break
+            else:
+                self.send("info string illegal move " + uci)
+                break
+        self.gs = gs
+
+    def go(self, args):
+        """ starts a search on a background thread, it prints info lines and then bestmove """
+        limits = {}
+        for i, token in enumerate(args[:-1]):
+            if token in ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "depth", "nodes"):
+                try:
+                    limits[token] = int(args[i + 1])
+                except ValueError:
+                    self.send("info string invalid value for {}: {}".format(token, args[i + 1]))
+        depth = limits.get("depth", MAX_PLY)
+        infinite = "infinite" in args
+        time_ms = None if infinite else self.time_budget(limits)
+        self.searcher()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run_search, args=(depth, time_ms, limits.get("nodes"), infinite),
+                                       daemon=True)
+        self.thread.start()
+
+    def time_budget(self, limits):
+        """ milliseconds to spend on this move, None to search until depth, nodes or stop """
+        if "movetime" in limits:
+            return max(1, limits["movetime"] - MOVE_OVERHEAD_MS)
+        remaining = limits.get("wtime" if self.gs.white_move else "btime")
+        if remaining is None:
+            return None
+        increment = limits.get("winc" if self.gs.white_move else "binc", 0)
+        moves_to_go = limits.get("movestogo", 0)
+        budget = remaining // (moves_to_go if moves_to_go > 0 else 30) + increment * 3 // 4
+        return max(1, min(budget, remaining // 2) - MOVE_OVERHEAD_MS)
+
+    def run_search(self, depth, time_ms, nodes, infinite):
+        move = self.book_move()
+        if move is None:
+            result = self.searcher().search(self.gs, depth=depth, time_ms=time_ms, nodes=nodes, info=self.send_info)
+            move = result.best_move
+        if infinite:
+            # the search can end early, on a mate or a single legal move, but UCI only allows bestmove after stop
+            self.stopped.wait()
+        self.send("bestmove " + (move.get_uci_notation() if move is not None else "0000"))
+
+    def book_move(self):
+        if self.book_path is None:
+            return None
+        if self.book is None:
+            from .polyglot import OpeningBook  # only loaded when a book is set
+            try:
+                self.book = OpeningBook(self.book_path)
+            except OSError as e:
+                self.send("info string can't open book: " + str(e))
+                self.book_path = None
+                return None
+        return self.book.choose(self.gs)
+
+    def send_info(self, result):
+        if abs(result.score) >= MATE - MAX_PLY:
+            plies = MATE - abs(result.score)
+            score = "mate {}".format((plies + 1) // 2 if result.score > 0 else -((plies + 1) // 2))
+        else:
+            score = "cp {}".format(result.score)
+        self.send("info depth {} score {} nodes {} nps {} time {} pv {}".format(
+            result.depth, score, result.nodes, result.nps, int(result.time * 1000),
+            " ".join(move.get_uci_notation() for move in result.pv)))
+
+    def wait(self):
+        """ stops a running search and waits for it to print its bestmove """
+        if self.thread is not None:
+            self.stopped.set()
+            # the search clears its stop flag when it starts, so keep asking until the thread has finished
+            while self.thread.is_alive():
+                self.search.stop()
+                self.thread.join(0.01)
+            self.thread = None
+
+
+def main(input_stream=sys.stdin, output=sys.stdout):
+    engine = UCIEngine(output)
+    for line in input_stream:
+        if not engine.handle(line):
+            break
+    engine.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
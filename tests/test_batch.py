@@ -0,0 +1,33 @@
+"""
+Batched analysis checked against the engine's own evaluation, check and attack detection, position by position.
+"""
+
+import numpy as np
+
+from Chess.ChessEngine import GameState
+from Chess.batch import analyse, pack
+from Chess.evaluation import evaluate
+from Chess.perft import POSITIONS
+
+FENS = [fen for fen, _ in POSITIONS.values()] + [
+    "4k3/8/8/8/8/8/4q3/4K3 w - - 0 1",
+    "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3",
+    "8/8/8/4k3/8/8/8/4K3 b - - 0 1"]
+
+
+def test_analyse():
+    positions = [GameState(fen) for fen in FENS]
+    result = analyse(*pack(FENS))
+    for i, gs in enumerate(positions):
+        assert result["eval"][i] == evaluate(gs)
+        assert result["in_check"][i] == gs.check("w" if gs.white_move else "b")
+        for key, color in (("white_attacks", "w"), ("black_attacks", "b")):
+            attacks = int(result[key][i])
+            assert all(bool(attacks >> sq & 1) == gs.attacked(1 << sq, color) for sq in range(64))
+
+
+def test_pack_game_states_and_fens_alike():
+    bitboards, white_move = pack(FENS)
+    from_states, white_from_states = pack(GameState(fen) for fen in FENS)
+    assert np.array_equal(bitboards, from_states)
+    assert np.array_equal(white_move, white_from_states)
@@ -0,0 +1,28 @@
+"""
+Evaluation totals kept by make_move and undo_move, checked against totals computed from scratch.
+"""
+
+import random
+
+import pytest
+
+from Chess.ChessEngine import GameState
+from Chess.evaluation import compute_scores
+from Chess.perft import POSITIONS
+
+
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_incremental_scores(name):
+    gs = GameState(POSITIONS[name][0])
+    start = (gs.mg_score, gs.eg_score, gs.phase)
+    rng = random.Random(name)
+    for _ in range(120):
+        moves = gs.get_legal_moves()
+        if not moves:
+            break
+        gs.make_move(rng.choice(moves))
+        assert (gs.mg_score, gs.eg_score, gs.phase) == compute_scores(gs)
+    while gs.move_log:
+        gs.undo_move()
+        assert (gs.mg_score, gs.eg_score, gs.phase) == compute_scores(gs)
+    assert (gs.mg_score, gs.eg_score, gs.phase) == start
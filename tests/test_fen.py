@@ -0,0 +1,15 @@
+"""
+FEN export, every position has to come back as the FEN it was loaded from.
+"""
+
+import pytest
+
+from Chess.ChessEngine import GameState
+from Chess.perft import POSITIONS
+
+
+@pytest.mark.parametrize("fen", [fen for fen, _ in POSITIONS.values()] + [
+    "rnbqkbnr/pp1ppppp/8/2pP4/8/8/PPP1PPPP/RNBQKBNR b Kq c3 0 2",
+    "8/8/8/4k3/8/8/8/4K3 b - - 57 90"])
+def test_fen_round_trip(fen):
+    assert GameState(fen).get_fen() == fen
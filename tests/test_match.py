@@ -0,0 +1,26 @@
+"""
+Match runner pieces that don't need a process pool.
+"""
+
+import pytest
+
+from Chess.match import EngineConfig, elo
+from Chess.search import MAX_PLY
+
+
+def test_engine_config_parse():
+    config = EngineConfig.parse("name=new,nodes=20000,hash=32")
+    assert (config.name, config.depth, config.time_ms, config.nodes, config.tt_size_mb) == ("new", MAX_PLY, None,
+                                                                                             20000, 32)
+
+
+@pytest.mark.parametrize("text", ["depth=4", "name=new", "name=new,hash=16", "name=new,depth=x"])
+def test_engine_config_parse_rejects(text):
+    with pytest.raises(ValueError):
+        EngineConfig.parse(text)
+
+
+def test_elo():
+    assert elo(0, 0, 0) == (0.0, 0.0)
+    assert elo(10, 0, 10)[0] == 0
+    assert elo(75, 0, 25)[0] == pytest.approx(190.8, abs=0.1)
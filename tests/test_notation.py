@@ -0,0 +1,28 @@
+"""
+SAN written by notation.SANWriter, the expected strings are the ones python-chess writes for the same moves.
+"""
+
+import pytest
+
+from Chess.ChessEngine import GameState
+from Chess.notation import san_moves
+
+
+@pytest.mark.parametrize("fen, moves, expected", [
+    # disambiguation by file, rank and both
+    ("4k3/8/8/8/8/5N2/8/1N2K3 w - - 0 1", ["b1d2", "f3d2"], ["Nbd2", "Nfd2"]),
+    ("4k3/8/8/R7/8/8/8/R3K3 w - - 0 1", ["a1a3", "a5a3"], ["R1a3", "R5a3"]),
+    ("4k3/8/8/8/8/Q7/8/Q1Q1K3 w - - 0 1", ["a1b2", "c1b2", "a3b2"], ["Qa1b2", "Qcb2", "Q3b2"]),
+    # discovered check by the rook behind the knight
+    ("4k3/8/8/8/4N3/8/8/4R1K1 w - - 0 1", ["e4c3", "e4d6", "e4g5"], ["Nc3+", "Nd6+", "Ng5+"]),
+    ("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", ["a1a8", "a1a7"], ["Ra8#", "Ra7"]),
+    ("4k3/1P6/8/8/8/8/8/4K3 w - - 0 1", ["b7b8q", "b7b8r", "b7b8b", "b7b8n"], ["b8=Q+", "b8=R+", "b8=B", "b8=N"]),
+    ("5k2/8/8/8/8/8/8/4K2R w K - 0 1", ["e1g1"], ["O-O+"]),
+    ("4k3/8/8/2KpP3/8/8/8/8 w - d6 0 1", ["e5d6"], ["exd6"]),
+])
+def test_san(fen, moves, expected):
+    gs = GameState(fen)
+    legal = gs.get_legal_moves()
+    sans = dict(zip((move.get_uci_notation() for move in legal), san_moves(gs, legal)))
+    assert [sans[move] for move in moves] == expected
+    assert gs.get_fen() == fen
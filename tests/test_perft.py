@@ -0,0 +1,17 @@
+"""
+Move generation checked against the published perft counts of the positions in perft.POSITIONS.
+"""
+
+import pytest
+
+from Chess.ChessEngine import GameState
+from Chess.perft import POSITIONS, perft
+
+
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_perft(name):
+    fen, counts = POSITIONS[name]
+    gs = GameState(fen)
+    for depth in (1, 2, 3):
+        assert perft(gs, depth) == counts[depth - 1]
+    assert gs.get_fen() == fen  # perft leaves the position as it was
@@ -0,0 +1,26 @@
+"""
+Polyglot keys checked against the reference keys published with the Polyglot book format.
+"""
+
+import pytest
+
+from Chess.ChessEngine import GameState
+from Chess.polyglot import polyglot_key
+
+
+@pytest.mark.parametrize("moves, key", [
+    ([], 0x463b96181691fc9c),
+    (["e2e4"], 0x823c9b50fd114196),
+    (["e2e4", "d7d5"], 0x0756b94461c50fb0),
+    (["e2e4", "d7d5", "e4e5"], 0x662fafb965db29d4),
+    (["e2e4", "d7d5", "e4e5", "f7f5"], 0x22a48b5a8e47ff78),
+    (["e2e4", "d7d5", "e4e5", "f7f5", "e1e2"], 0x652a607ca3f242c1),
+    (["e2e4", "d7d5", "e4e5", "f7f5", "e1e2", "e8f7"], 0x00fdd303c946bdd9),
+    (["a2a4", "b7b5", "h2h4", "b5b4", "c2c4"], 0x3c8123ea7b067637),
+    (["a2a4", "b7b5", "h2h4", "b5b4", "c2c4", "b4c3", "a1a3"], 0x5c3f9b829b279560),
+])
+def test_polyglot_key(moves, key):
+    gs = GameState()
+    for uci in moves:
+        gs.make_move(next(move for move in gs.get_legal_moves() if move.get_uci_notation() == uci))
+    assert polyglot_key(gs) == key
@@ -0,0 +1,33 @@
+"""
+Search edge cases: mates, forced moves and the ply limit.
+"""
+
+from Chess.ChessEngine import GameState
+from Chess.search import Search, INFINITY, MATE, MAX_PLY
+
+
+def test_finds_mate_in_one():
+    result = Search().search(GameState("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"), depth=3)
+    assert result.best_move.get_uci_notation() == "a1a8"
+    assert result.score == MATE - 1
+
+
+def test_quiescence_stops_at_the_ply_limit_in_check():
+    gs = GameState("k7/8/8/8/8/8/1q6/K2Q4 w - - 0 1")
+    for ply in (MAX_PLY - 1, MAX_PLY):
+        Search().quiescence(gs, -INFINITY, INFINITY, ply)
+
+
+def test_scores_a_forced_move():
+    # the knight's check leaves black one move, after which the queen on g6 is lost
+    result = Search().search(GameState("8/8/4Q1q1/8/8/8/1K3N2/3k4 b - - 0 1"), depth=8)
+    assert result.best_move.get_uci_notation() == "d1d2"
+    assert 0 < result.depth < 8
+    assert result.score < -500
+    # the only move walks into mate
+    assert Search().search(GameState("8/5K2/3kN3/2Q5/8/7q/8/8 b - - 0 1")).score == -MATE + 2
+
+
+def test_no_legal_moves():
+    assert Search().search(GameState("R6k/6pp/8/8/8/8/8/6K1 b - - 0 1")).score == -MATE
+    assert Search().search(GameState("7k/5K2/6Q1/8/8/8/8/8 b - - 0 1")).score == 0
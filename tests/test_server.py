@@ -0,0 +1,33 @@
+"""
+Request parsing of the analysis server, bad requests have to be answered with an error before reaching a worker.
+"""
+
+import pytest
+
+from Chess.ChessEngine import START_FEN
+from Chess.search import MAX_PLY
+from Chess.server import AnalysisServer, DEFAULT_TIME_MS
+
+
+def test_parse_task_defaults():
+    assert AnalysisServer.parse_task({}) == (START_FEN, [], MAX_PLY, DEFAULT_TIME_MS, None)
+    assert AnalysisServer.parse_task({"depth": 4, "moves": ["e2e4"]}) == (START_FEN, ["e2e4"], 4, None, None)
+
+
+@pytest.mark.parametrize("request_", [
+    {"depth": True},
+    {"nodes": 0},
+    {"time_ms": 1.5},
+    {"moves": "e2e4"},
+    {"fen": 5},
+    {"fen": "not a fen"},
+    {"fen": "8/8/8/8/8/8/8/8 w - - 0 1"},
+    {"fen": "4k3/8/8/8/8/8/8/4KK2 w - - 0 1"},
+    {"fen": "4k3/8/8/8/8/8/8/4K2x w - - 0 1"},
+    {"fen": "4k3/8/8/8/8/8/8/4K3 x - - 0 1"},
+    {"fen": "4k3/8/8/8/8/8/8/4K3 w - e4 0 1"},
+    {"fen": "4k3/8/8/8/8/8/8/4R2K w - - 0 1"},
+])
+def test_parse_task_rejects(request_):
+    with pytest.raises(ValueError):
+        AnalysisServer.parse_task(request_)
@@ -0,0 +1,44 @@
+"""
+Zobrist keys kept by make_move and undo_move, checked against keys computed from scratch, and the transposition
+table.
+"""
+
+import random
+
+import pytest
+
+from Chess.ChessEngine import GameState
+from Chess.perft import POSITIONS
+from Chess.transposition import TranspositionTable, EXACT, LOWER, size_bytes
+
+
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_incremental_zobrist_key(name):
+    fen = POSITIONS[name][0]
+    gs = GameState(fen)
+    start = gs.zobrist_key
+    rng = random.Random(name)
+    for _ in range(120):
+        moves = gs.get_valid_moves(cross_check=True)
+        if not moves:
+            break
+        gs.make_move(rng.choice(moves))
+        assert gs.zobrist_key == gs.compute_zobrist_key()
+    while gs.move_log:
+        gs.undo_move()
+        assert gs.zobrist_key == gs.compute_zobrist_key()
+    assert gs.zobrist_key == start
+    assert gs.get_fen() == fen
+
+
+def test_clear_empties_the_shared_buffer():
+    buffer = bytearray(size_bytes(1))
+    tt = TranspositionTable(1, buffer)
+    for key in range(1, 5000, 7):
+        tt.store(key * 0x9E3779B97F4A7C15 % (1 << 64), 3, 42, EXACT, 17)
+    tt.new_search()
+    tt.clear()
+    assert not any(buffer)
+    assert tt.generation == 0
+    tt.store(12345, 2, -7, LOWER, 9)
+    assert tt.probe(12345) == (2, -7, LOWER, 9)